@@ -1,12 +1,26 @@
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from api_gateway.routes.quiz import router as quiz_router
 from api_gateway.routes.auth import router as auth_router
-from database.session import engine
+from database.session import engine, SessionLocal
 from database.models import Base
+from ml_engine.question_bank import question_bank, QUESTION_SOURCE
+from ml_engine.question_store import ensure_question_table, seed_from_json
+from rag_service.vector_store import vector_store
+from rag_service.llm_client import llm_gateway
+from context_engine.state_cache import state_cache
+from context_engine.mistake_log import mistake_writer
+from api_gateway.passwords import password_executor
 
 # Create tables if they don't exist
+ensure_question_table(engine)
 Base.metadata.create_all(bind=engine)
+# create_all skips tables that already exist, so add indexes introduced since
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
 
 app = FastAPI(title="NeuroAdaptive Quiz Engine")
 
@@ -18,9 +32,63 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress bodies over GZIP_MIN_SIZE bytes for clients that accept gzip (SSE streams are left alone)
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_SIZE", "500")))
+
 app.include_router(quiz_router, prefix="/quiz")
 app.include_router(auth_router, prefix="/auth")
 
+@app.on_event("startup")
+def seed_question_bank():
+    # First run on a fresh DB: load questions.json into the questions table
+    if QUESTION_SOURCE != "db":
+        return
+    db = SessionLocal()
+    try:
+        seeded = seed_from_json(db, question_bank.dataset_path)
+        if seeded:
+            print(f"Seeded questions table with {seeded} questions.")
+    except Exception as e:
+        print(f"Error seeding questions table: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def warm_question_bank():
+    # First load is the only blocking one; later reloads happen off the request path
+    question_bank.refresh()
+
+@app.on_event("startup")
+def warm_vector_store():
+    # Build the FAISS index in the background so the API can serve immediately
+    vector_store.start()
+
+@app.on_event("startup")
+def start_state_flusher():
+    state_cache.start()
+
+@app.on_event("startup")
+async def start_mistake_writer():
+    mistake_writer.start()
+
+@app.on_event("shutdown")
+async def drain_mistake_writer():
+    await mistake_writer.drain()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await llm_gateway.client.aclose()
+
+@app.on_event("shutdown")
+def stop_password_pool():
+    password_executor.shutdown(wait=False)
+
+@app.on_event("shutdown")
+def drain_state_cache():
+    # Write any learner-state updates still held in memory
+    state_cache.drain()
+
 @app.get("/")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "vector_store": vector_store.status}
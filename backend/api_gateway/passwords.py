@@ -0,0 +1,65 @@
+# Password hashing off the request path.
+# bcrypt is CPU-bound and holds a core for its whole run, so it gets its own
+# bounded process pool: a login burst queues there (or is turned away with 503)
+# instead of starving the threadpool and event loop that serve /quiz.
+
+import os
+
+import bcrypt
+
+from rag_service.executor import BoundedExecutor
+
+# Cost factor for new hashes. Each +1 doubles CPU per login; existing users are
+# rehashed at the new cost the next time they log in.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Leave a core for the event loop
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "256"))
+PASSWORD_TIMEOUT = float(os.getenv("PASSWORD_TIMEOUT", "10"))
+
+def _secret(password):
+    # bcrypt only reads the first 72 bytes; earlier hashes were made from the truncated password too
+    return password.encode('utf-8')[:72]
+
+def hash_rounds(hashed):
+    """Cost factor of a $2b$<rounds>$... hash, or None if it isn't one."""
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    return bcrypt.hashpw(_secret(password), bcrypt.gensalt(rounds)).decode('ascii')
+
+def verify_password(password, hashed):
+    try:
+        return bcrypt.checkpw(_secret(password), hashed.encode('ascii'))
+    except (AttributeError, ValueError):
+        return False
+
+def verify_and_update(password, hashed, rounds=BCRYPT_ROUNDS):
+    """
+    (valid, new_hash): new_hash is set when the password is right but the
+    stored hash uses another cost factor. One pool job, so a rehash doesn't
+    queue twice.
+    """
+    if not verify_password(password, hashed):
+        return False, None
+    if hash_rounds(hashed) != rounds:
+        return True, hash_password(password, rounds)
+    return True, None
+
+password_executor = BoundedExecutor(
+    max_workers=PASSWORD_WORKERS,
+    max_pending=PASSWORD_MAX_PENDING,
+    name="bcrypt",
+    processes=True
+)
+
+async def hash_password_async(password):
+    """Raises ExecutorOverloaded when the queue is full, asyncio.TimeoutError when it is too slow."""
+    return await password_executor.run(hash_password, password, BCRYPT_ROUNDS, timeout=PASSWORD_TIMEOUT)
+
+async def verify_password_async(password, hashed):
+    return await password_executor.run(verify_and_update, password, hashed, BCRYPT_ROUNDS, timeout=PASSWORD_TIMEOUT)
+
@@ -0,0 +1,50 @@
+# Response encodings for the hot quiz routes.
+# JSON is rendered with orjson (compact, several times faster than the stdlib
+# encoder); clients that send "Accept: application/msgpack" get MessagePack
+# instead, when msgpack is installed. gzip is applied app-wide by GZipMiddleware.
+
+import json
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_TYPE = "application/msgpack"
+
+def dumps_json(content):
+    if orjson is not None:
+        # NumPy scalars/arrays can come out of the knowledge model as-is
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def dumps_msgpack(content):
+    return msgpack.packb(content, use_bin_type=True)
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps_json(content)
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_TYPE
+
+    def render(self, content):
+        return dumps_msgpack(content)
+
+def wants_msgpack(request: Request):
+    return msgpack is not None and MSGPACK_TYPE in request.headers.get("accept", "")
+
+def negotiated_response(request: Request, content):
+    """MessagePack if the client asked for it (and we can), else compact JSON."""
+    response_class = MsgpackResponse if wants_msgpack(request) else FastJSONResponse
+    return response_class(content, headers={"Vary": "Accept"})
@@ -1,39 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
-from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 
-from database.session import get_db
+from database.session import get_async_db
 from database.models import User
+from api_gateway.passwords import password_executor, hash_password_async, verify_password_async
+from api_gateway.tokens import user_token
+from rag_service.executor import ExecutorOverloaded
 
 router = APIRouter()
 
-# --- Configuration ---
-SECRET_KEY = "your-secret-key-should-be-in-env"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 600 # 10 hours for dev
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # --- Helpers ---
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+PASSWORD_BUSY = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many logins right now, retry shortly",
+    headers={"Retry-After": "1"}
+)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+async def run_password_job(job):
+    # Hashing runs on the bcrypt process pool; a full queue is a 503, not a pile-up
+    try:
+        return await job
+    except (ExecutorOverloaded, asyncio.TimeoutError):
+        raise PASSWORD_BUSY
 
 # --- Schemas ---
 class UserSignup(BaseModel):
@@ -53,21 +44,21 @@ class Token(BaseModel):
 # --- Endpoints ---
 
 @router.post("/signup", response_model=Token)
-def signup(user_data: UserSignup, db: Session = Depends(get_db)):
+async def signup(user_data: UserSignup, db: AsyncSession = Depends(get_async_db)):
     # Check if user exists
-    db_user = db.query(User).filter(User.email == user_data.email).first()
+    db_user = (await db.execute(select(User).where(User.email == user_data.email))).scalar_one_or_none()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create user
-    hashed_pwd = get_password_hash(user_data.password)
+    hashed_pwd = await run_password_job(hash_password_async(user_data.password))
     new_user = User(email=user_data.email, hashed_password=hashed_pwd)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     # Generate token
-    access_token = create_access_token(data={"sub": new_user.email})
+    access_token = user_token(new_user)
     return {
         "access_token": access_token, 
         "token_type": "bearer",
@@ -76,18 +67,28 @@ def signup(user_data: UserSignup, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=Token)
-def login(user_data: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user_data.email).first()
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.execute(select(User).where(User.email == user_data.email))).scalar_one_or_none()
     if not db_user:
         raise HTTPException(status_code=400, detail="Invalid credentials")
     
-    if not verify_password(user_data.password, db_user.hashed_password):
+    valid, new_hash = await run_password_job(verify_password_async(user_data.password, db_user.hashed_password))
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
+    if new_hash:
+        # Stored at an older cost factor: upgrade it while we have the plain password
+        db_user.hashed_password = new_hash
+        await db.commit()
         
-    access_token = create_access_token(data={"sub": db_user.email})
+    access_token = user_token(db_user)
     return {
         "access_token": access_token, 
         "token_type": "bearer",
         "user_id": db_user.id,
         "email": db_user.email
     }
+
+@router.get("/password_stats")
+def password_stats():
+    # Queue depth and rejections of the bcrypt pool, for sizing PASSWORD_WORKERS / BCRYPT_ROUNDS
+    return password_executor.stats()
@@ -1,6 +1,17 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from quiz_orchestrator.orchestrator import handle_answer
+from quiz_orchestrator.orchestrator import handle_answer_async, handle_answers_async, plan_session_async, graded_payload
+from api_gateway.tokens import Identity, current_user
+from api_gateway.responses import negotiated_response
+from context_engine.learner_state import get_weakest_topics
+from context_engine.mistake_log import mistake_writer, get_mistakes
+from rag_service.rag_pipeline import cache_stats, stream_explanation
+from rag_service.executor import ExecutorOverloaded
+from rag_service.llm_client import LLMBusy
+from typing import List, Optional
+import asyncio
+import json
 import random
 
 router = APIRouter()
@@ -29,11 +40,74 @@ async def generate_mnemonic(req: MnemonicRequest):
     return {"image_url": random.choice(placeholders), "alt_text": prompt}
 
 @router.post("/next")
-def next_question(payload: dict):
-    return handle_answer(payload)
+async def next_question(payload: dict, request: Request, user: Identity = Depends(current_user)):
+    # Identity comes from the bearer token (cached per token), never from the body
+    # orjson by default, MessagePack on "Accept: application/msgpack"
+    return negotiated_response(request, await handle_answer_async(payload, user.user_id))
+
+# Caps for the batched endpoints: one request is one learner's sitting, not a bulk import
+MAX_SESSION_LENGTH = 50
+MAX_ANSWERS_PER_BATCH = 100
+
+class SessionRequest(BaseModel):
+    length: int = 10
+
+@router.post("/session")
+async def quiz_session(req: SessionRequest, request: Request, user: Identity = Depends(current_user)):
+    # Prefetch: the next `length` planned questions in one round trip
+    length = min(max(req.length, 1), MAX_SESSION_LENGTH)
+    return negotiated_response(request, await plan_session_async(user.user_id, length))
+
+class AnswerItem(BaseModel):
+    question_id: str
+    answer: str
+    time_taken: float = 0
+    confidence: float = 0.5
+
+class AnswerBatch(BaseModel):
+    answers: List[AnswerItem]
+    prefetch: int = 0 # also plan this many follow-up questions
+
+@router.post("/answers")
+async def submit_answers(batch: AnswerBatch, request: Request, user: Identity = Depends(current_user)):
+    # Many answers, one learner-state update; grades come back in submission order
+    if len(batch.answers) > MAX_ANSWERS_PER_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_ANSWERS_PER_BATCH} answers per batch")
+    prefetch = min(max(batch.prefetch, 0), MAX_SESSION_LENGTH)
+    answers = [a.model_dump() for a in batch.answers]
+    return negotiated_response(request, await handle_answers_async(answers, user.user_id, prefetch))
+
+@router.post("/explain/stream")
+async def explain_stream(payload: dict, user: Identity = Depends(current_user)):
+    # Only for a question this learner has already been graded on; the prompt is
+    # rebuilt from that server-side record, not from the request body
+    graded = graded_payload(user.user_id, payload.get("question_id"))
+    if graded is None:
+        raise HTTPException(status_code=404, detail="No graded answer to explain for this question")
+
+    # Server-Sent Events: one `data:` frame per token, then [DONE]
+    async def events():
+        try:
+            async for token in stream_explanation(graded):
+                yield f"data: {json.dumps({'token': token})}\n\n"
+        except (LLMBusy, ExecutorOverloaded) as e:
+            yield f"event: error\ndata: {json.dumps({'error': 'busy', 'detail': str(e)})}\n\n"
+        except asyncio.TimeoutError:
+            yield f"event: error\ndata: {json.dumps({'error': 'timeout'})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.get("/cache_stats")
+def rag_cache_stats():
+    # Hit/miss/eviction counters for sizing the RAG caches from real traffic
+    return {"caches": cache_stats()}
+
+@router.get("/weak_topics")
+async def weak_topics(n: int = 5, user: Identity = Depends(current_user)):
+    return {"user_id": user.user_id, "topics": await get_weakest_topics(user.user_id, n)}
 
 class MistakeLog(BaseModel):
-    user_id: int = 1 # Default for prototype
     question_id: str
     topic: str
     question_text: str
@@ -41,9 +115,18 @@ class MistakeLog(BaseModel):
     correct_answer: str
 
 @router.post("/log_mistake")
-async def log_mistake(mistake: MistakeLog):
-    # In a real app, we'd use a DB session here.
-    # For this prototype, we'll just print to console to simulate persistence
-    # and maybe append to a local JSON file for persistence demo if needed.
-    print(f"PERSISTING MISTAKE: {mistake}")
-    return {"status": "saved", "id": random.randint(1000, 9999)}
+async def log_mistake(mistake: MistakeLog, user: Identity = Depends(current_user)):
+    # Id is reserved now; the row is bulk-inserted by the background writer
+    try:
+        mistake_id = await mistake_writer.log(
+            user.user_id, mistake.question_id, mistake.topic,
+            mistake.question_text, mistake.user_answer, mistake.correct_answer
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Mistake log is busy, retry shortly")
+    return {"status": "saved", "id": mistake_id}
+
+@router.get("/mistakes")
+async def mistakes(limit: int = 20, cursor: Optional[str] = None, user: Identity = Depends(current_user)):
+    # Mistake notebook, newest first; pass next_cursor back to get the following page
+    return await get_mistakes(user.user_id, limit=min(max(limit, 1), 100), cursor=cursor)
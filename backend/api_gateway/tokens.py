@@ -0,0 +1,73 @@
+# Access tokens: issued by /auth, verified by the current_user dependency.
+# Verification is stateless (signature + exp, no users query) and the decoded
+# identity is cached per token until it expires, so the quiz hot path pays for
+# one HMAC check per token rather than one per request.
+
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+
+from rag_service.cache import LRUCache
+
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-should-be-in-env")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "600")) # 10 hours for dev
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+class Identity:
+    """Who a verified token belongs to."""
+
+    __slots__ = ("user_id", "email")
+
+    def __init__(self, user_id, email):
+        self.user_id = user_id
+        self.email = email
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    to_encode = data.copy()
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def user_token(user):
+    # uid rides in the token so verifying it never needs a users lookup
+    return create_access_token(data={"sub": user.email, "uid": user.id})
+
+# Decoded identities keyed by the raw token; each entry expires with its token's exp
+token_cache = LRUCache(maxsize=TOKEN_CACHE_SIZE, name="jwt_claims")
+
+CREDENTIALS_ERROR = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"}
+)
+
+def decode_token(token):
+    """Identity for a valid token (cached until exp), else raises CREDENTIALS_ERROR."""
+    identity = token_cache.get(token)
+    if identity is not None:
+        return identity
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        identity = Identity(int(claims["uid"]), claims.get("sub"))
+        remaining = float(claims["exp"]) - time.time()
+    except (JWTError, KeyError, TypeError, ValueError):
+        raise CREDENTIALS_ERROR
+    # A token about to expire isn't worth caching (and a ttl of 0 would mean "forever")
+    if remaining > 1:
+        token_cache.put(token, identity, ttl=remaining)
+    return identity
+
+_bearer = HTTPBearer(auto_error=False)
+
+async def current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> Identity:
+    # async so FastAPI runs it on the event loop: a cache hit is a dict lookup,
+    # not worth a threadpool hop on every quiz request
+    if credentials is None:
+        raise CREDENTIALS_ERROR
+    return decode_token(credentials.credentials)
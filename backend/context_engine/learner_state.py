@@ -1,71 +1,88 @@
-from database.session import SessionLocal
-from database.models import LearnerState
+from database.session import SessionLocal, AsyncSessionLocal
+from context_engine.state_cache import state_cache
+from context_engine.storage import (
+    load_learner, load_learner_async, learner_write_rows, write_learners, write_learners_async,
+    weakest_topics_query
+)
+from ml_engine.bkt import knowledge_tracer
 import datetime
+import os
 
-def update_context(payload):
-    """
-    Updates the learner's state based on the provided payload (answer, time, confidence).
-    Persists data to SQLite using SQLAlchemy.
-    """
+# Apply answers in memory and flush to the DB in batches (see state_cache.py).
+# Set LEARNER_STATE_WRITE_BEHIND=0 to commit every answer directly.
+WRITE_BEHIND = os.getenv("LEARNER_STATE_WRITE_BEHIND", "1") == "1"
+
+def parse_user_id(payload):
     try:
         raw_user_id = payload.get("user_id", 0)
         # Ensure ID is Integer
         try:
-            user_id = int(raw_user_id)
+            return int(raw_user_id)
         except:
-            user_id = 0
-            
+            return 0
+
     except Exception:
-        user_id = 0
+        return 0
+
+def apply_answer(state, payload):
+    """
+    Applies one answer to a LearnerRecord in place (no I/O).
+    Shared by the write-behind and direct update paths.
+    """
+    # Extract Payload Data
+    # We need to look up topic from question_id ideally, but for now we trust payload or default
+    topic = payload.get("topic", "General") # Use topic from payload if available
+    is_correct = payload.get("is_correct", False)
+
+    # Cloning existing mastery dict
+    current_mastery = dict(state.topic_mastery) if state.topic_mastery else {}
+    previous = current_mastery.get(topic)
+    if previous is None:
+        previous = knowledge_tracer.prior(topic)
+
+    # Knowledge tracing: mastery is P(known), updated by Bayes on the graded answer (O(1))
+    current_score = knowledge_tracer.update(previous, topic, is_correct)
+
+    delta = current_score - previous
+    current_mastery[topic] = current_score
+
+    state.topic_mastery = current_mastery
+    state.topic_attempts[topic] = state.topic_attempts.get(topic, 0) + 1
+    state.dirty_topics.add(topic)
+    state.confidence_avg = (state.confidence_avg + payload.get("confidence", 0.5)) / 2
+    state.last_updated = datetime.datetime.utcnow()
+
+    return {
+        "topic_mastery": state.topic_mastery,
+        "confidence_avg": state.confidence_avg,
+        # What this answer changed, for clients that only want deltas
+        "mastery_delta": {topic: delta}
+    }
+
+def update_context(payload):
+    """
+    Updates the learner's state based on the provided payload (answer, time, confidence).
+    Persists data to SQLite using SQLAlchemy.
+    """
+    user_id = parse_user_id(payload)
+
+    if WRITE_BEHIND:
+        try:
+            state = state_cache.load(user_id)
+            return state_cache.update(state, lambda s: apply_answer(s, payload))
+        except Exception as e:
+            print(f"Error updating learner state: {e}")
+            return {"topic_mastery": {}, "error": str(e)}
 
     db = SessionLocal()
     try:
-        # Fetch existing state
-        state = db.query(LearnerState).filter(LearnerState.user_id == user_id).first()
-        
-        if not state:
-            # Initialize new state
-            state = LearnerState(
-                user_id=user_id,
-                topic_mastery={"General": 0.5},
-                confidence_avg=0.5,
-                error_pattern=[],
-                last_updated=datetime.datetime.utcnow()
-            )
-            db.add(state)
-        
-        # Extract Payload Data
-        # We need to look up topic from question_id ideally, but for now we trust payload or default
-        topic = payload.get("topic", "General") # Use topic from payload if available
-        is_correct = payload.get("is_correct", False)
-        
-        # Cloning existing mastery dict
-        current_mastery = dict(state.topic_mastery) if state.topic_mastery else {}
-        current_score = current_mastery.get(topic, 0.5)
-        
-        # Adaptive Logic
-        if is_correct:
-            # Increase mastery (diminishing returns)
-            increment = 0.1 * (1.1 - current_score) 
-            current_score = min(1.0, current_score + increment)
-        else:
-            # Decrease mastery
-            decrement = 0.05
-            current_score = max(0.1, current_score - decrement)
-        
-        current_mastery[topic] = current_score
-        
-        state.topic_mastery = current_mastery
-        state.confidence_avg = (state.confidence_avg + payload.get("confidence", 0.5)) / 2
-        state.last_updated = datetime.datetime.utcnow()
-        
+        state = load_learner(db, user_id)
+        result = apply_answer(state, payload)
+        # Single-row upserts: the learner row plus the one topic that changed
+        write_learners(db, *learner_write_rows([state]))
         db.commit()
-        db.refresh(state)
-        
-        return {
-            "topic_mastery": state.topic_mastery,
-            "confidence_avg": state.confidence_avg
-        }
+
+        return result
 
     except Exception as e:
         print(f"Error updating learner state: {e}")
@@ -74,3 +91,117 @@ def update_context(payload):
         return {"topic_mastery": {}, "error": str(e)}
     finally:
         db.close()
+
+async def update_context_async(payload):
+    """
+    Non-blocking variant of update_context for async handlers (aiosqlite).
+    """
+    user_id = parse_user_id(payload)
+
+    if WRITE_BEHIND:
+        try:
+            state = await state_cache.load_async(user_id)
+            return state_cache.update(state, lambda s: apply_answer(s, payload))
+        except Exception as e:
+            print(f"Error updating learner state: {e}")
+            return {"topic_mastery": {}, "error": str(e)}
+
+    async with AsyncSessionLocal() as db:
+        try:
+            state = await load_learner_async(db, user_id)
+            result = apply_answer(state, payload)
+            await write_learners_async(db, *learner_write_rows([state]))
+            await db.commit()
+
+            return result
+
+        except Exception as e:
+            print(f"Error updating learner state: {e}")
+            await db.rollback()
+            # Return fallback to avoid crashing flow
+            return {"topic_mastery": {}, "error": str(e)}
+
+def apply_answers(state, payloads):
+    """
+    Applies answers in order to one LearnerRecord (no I/O). Returns the final
+    state with mastery_delta summed per topic over the whole batch.
+    """
+    deltas = {}
+    result = {"topic_mastery": state.topic_mastery, "confidence_avg": state.confidence_avg}
+    for payload in payloads:
+        result = apply_answer(state, payload)
+        for topic, delta in result["mastery_delta"].items():
+            deltas[topic] = deltas.get(topic, 0.0) + delta
+    result["mastery_delta"] = deltas
+    return result
+
+async def update_context_batch_async(user_id, payloads):
+    """
+    Applies a batch of graded answers for one learner in one step: a single
+    cache update (flushed in one transaction by the write-behind flusher), or
+    with write-behind off, one load, one upsert of the touched topics and one commit.
+    """
+    if WRITE_BEHIND:
+        try:
+            state = await state_cache.load_async(user_id)
+            return state_cache.update(state, lambda s: apply_answers(s, payloads))
+        except Exception as e:
+            print(f"Error updating learner state: {e}")
+            return {"topic_mastery": {}, "error": str(e)}
+
+    async with AsyncSessionLocal() as db:
+        try:
+            state = await load_learner_async(db, user_id)
+            result = apply_answers(state, payloads)
+            await write_learners_async(db, *learner_write_rows([state]))
+            await db.commit()
+
+            return result
+
+        except Exception as e:
+            print(f"Error updating learner state: {e}")
+            await db.rollback()
+            return {"topic_mastery": {}, "error": str(e)}
+
+def get_learner_state(user_id):
+    """Current mastery map and confidence, without applying anything."""
+    try:
+        if WRITE_BEHIND:
+            state = state_cache.load(user_id)
+        else:
+            db = SessionLocal()
+            try:
+                state = load_learner(db, user_id)
+            finally:
+                db.close()
+    except Exception as e:
+        print(f"Error loading learner state: {e}")
+        return {"topic_mastery": {}, "error": str(e)}
+    return {"topic_mastery": dict(state.topic_mastery), "confidence_avg": state.confidence_avg}
+
+async def get_learner_state_async(user_id):
+    """Current mastery map and confidence, without applying anything (for session planning)."""
+    try:
+        if WRITE_BEHIND:
+            state = await state_cache.load_async(user_id)
+        else:
+            async with AsyncSessionLocal() as db:
+                state = await load_learner_async(db, user_id)
+    except Exception as e:
+        print(f"Error loading learner state: {e}")
+        return {"topic_mastery": {}, "error": str(e)}
+    return {"topic_mastery": dict(state.topic_mastery), "confidence_avg": state.confidence_avg}
+
+async def get_weakest_topics(user_id, n=5):
+    """
+    A learner's n lowest-mastery topics, weakest first.
+    Served from the write-behind cache when the learner is active (it may be
+    ahead of the DB), otherwise by an indexed query on topic_mastery.
+    """
+    cached = state_cache.weakest_topics(user_id, n)
+    if cached is not None:
+        return [{"topic": topic, "mastery": mastery, "attempts": attempts} for topic, mastery, attempts in cached]
+
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(weakest_topics_query(user_id, n))).all()
+    return [{"topic": r.topic, "mastery": r.mastery, "attempts": r.attempts} for r in rows]
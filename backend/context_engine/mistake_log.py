@@ -0,0 +1,225 @@
+import asyncio
+import datetime
+import json
+import os
+
+from sqlalchemy import select, or_, and_
+
+from database.session import SessionLocal, AsyncSessionLocal
+from database.models import Mistake
+from database.sequences import IdAllocator
+from database.upsert import upsert_statement
+
+# Queued by drain() so the writer finishes its current batch and exits
+_STOP = object()
+
+class MistakeWriter:
+    """
+    Batched, asynchronous persistence for the mistake notebook.
+
+    log() reserves a real primary key, enqueues the row on a bounded queue and
+    returns; a background task drains the queue and writes each batch with a
+    single bulk INSERT. A full queue makes log() wait up to enqueue_timeout
+    (backpressure) before giving up.
+
+    The client has already been told "saved", so a failed batch is retried
+    with backoff and, if the DB stays unavailable, appended to spill_path;
+    start() replays that file. Inserts are idempotent on id, so a retry
+    after an ambiguous commit never duplicates a row.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=200, flush_interval=0.5, enqueue_timeout=1.0,
+                 max_attempts=5, retry_backoff=0.2, spill_path=None):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.spill_path = spill_path
+        self.ids = IdAllocator(SessionLocal, "mistakes", Mistake)
+
+        self._queue = None
+        self._task = None
+        self._replay_task = None
+
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.spilled = 0
+
+    # --- Lifecycle ---
+    def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        if self.spill_path and os.path.exists(self.spill_path):
+            self._replay_task = asyncio.get_running_loop().create_task(self._replay_spill())
+
+    async def drain(self):
+        """Stops the background task and writes everything still queued."""
+        if self._task is None:
+            return
+        if self._replay_task is not None:
+            await self._replay_task
+            self._replay_task = None
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        # Rows that raced in behind the stop marker
+        while not self._queue.empty():
+            batch, _ = self._take_batch([])
+            await self._write(batch)
+
+    # --- Producer ---
+    async def log(self, user_id, question_id, topic, question_text, user_answer, correct_answer):
+        if self._task is None:
+            self.start()
+
+        # Only one call in block_size touches the DB; keep that one off the event loop
+        if self.ids.has_reserved():
+            mistake_id = self.ids.next_id()
+        else:
+            mistake_id = await asyncio.to_thread(self.ids.next_id)
+        row = {
+            "id": mistake_id,
+            "user_id": user_id,
+            "question_id": question_id,
+            "topic": topic,
+            "question_text": question_text,
+            "user_answer": user_answer,
+            "correct_answer": correct_answer,
+            "timestamp": datetime.datetime.utcnow()
+        }
+        await asyncio.wait_for(self._queue.put(row), self.enqueue_timeout)
+        return mistake_id
+
+    # --- Consumer ---
+    def _take_batch(self, batch):
+        while len(batch) < self.batch_size and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            # Give concurrent requests a moment to pile in, then take what's there
+            await asyncio.sleep(self.flush_interval if self._queue.qsize() < self.batch_size else 0)
+            batch, stop = self._take_batch([item])
+            await self._write(batch)
+            if stop:
+                return
+
+    async def _write(self, batch):
+        if not batch:
+            return
+        for attempt in range(self.max_attempts):
+            try:
+                async with AsyncSessionLocal() as db:
+                    stmt = upsert_statement(Mistake, db.get_bind().dialect.name, ["id"])
+                    await db.execute(stmt, batch)
+                    await db.commit()
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                # e.g. SQLite busy past its timeout while the learner-state flusher holds the lock
+                print(f"Error writing {len(batch)} mistakes (attempt {attempt + 1}/{self.max_attempts}): {e}")
+                if attempt + 1 < self.max_attempts:
+                    self.retries += 1
+                    await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+        self._spill(batch)
+
+    # --- Dead letters ---
+    def _spill(self, batch):
+        if not self.spill_path:
+            print(f"Dropping {len(batch)} mistakes: DB unavailable and no spill file configured")
+            return
+        with open(self.spill_path, 'a', encoding='utf-8') as f:
+            for row in batch:
+                f.write(json.dumps({**row, "timestamp": row["timestamp"].isoformat()}) + "\n")
+        self.spilled += len(batch)
+        print(f"Spilled {len(batch)} mistakes to {self.spill_path}; they are replayed on next start")
+
+    async def _replay_spill(self):
+        # Claim the file first so rows that fail again are spilled to a fresh one
+        replay = f"{self.spill_path}.{os.getpid()}.replay"
+        os.replace(self.spill_path, replay)
+        replayed = 0
+        batch = []
+        with open(replay, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue # torn last line
+                row["timestamp"] = datetime.datetime.fromisoformat(row["timestamp"])
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    await self._write(batch)
+                    replayed += len(batch)
+                    batch = []
+        await self._write(batch)
+        replayed += len(batch)
+        # Only now: every row is either in the DB or back in the spill file
+        os.remove(replay)
+        print(f"Replayed {replayed} spilled mistakes")
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "spilled": self.spilled
+        }
+
+def _cursor(row):
+    return f"{row.timestamp.isoformat()}_{row.id}"
+
+def _parse_cursor(cursor):
+    timestamp, _, mistake_id = cursor.rpartition("_")
+    return datetime.datetime.fromisoformat(timestamp), int(mistake_id)
+
+async def get_mistakes(user_id, limit=20, cursor=None):
+    """
+    One page of a learner's mistakes, newest first.
+    Keyset pagination on (timestamp, id) so every page is an index range scan
+    on ix_mistakes_user_timestamp, however deep the notebook goes.
+    """
+    query = select(Mistake).where(Mistake.user_id == user_id)
+    if cursor:
+        before_ts, before_id = _parse_cursor(cursor)
+        query = query.where(or_(
+            Mistake.timestamp < before_ts,
+            and_(Mistake.timestamp == before_ts, Mistake.id < before_id)
+        ))
+    query = query.order_by(Mistake.timestamp.desc(), Mistake.id.desc()).limit(limit + 1)
+
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(query)).scalars().all()
+
+    page = rows[:limit]
+    return {
+        "items": [{
+            "id": r.id,
+            "question_id": r.question_id,
+            "topic": r.topic,
+            "question_text": r.question_text,
+            "user_answer": r.user_answer,
+            "correct_answer": r.correct_answer,
+            "date": r.timestamp.isoformat() if r.timestamp else None
+        } for r in page],
+        "next_cursor": _cursor(page[-1]) if len(rows) > limit else None
+    }
+
+# Singleton instance
+current_dir = os.path.dirname(os.path.abspath(__file__))
+spill_path = os.getenv("MISTAKE_SPILL_PATH", os.path.join(current_dir, "..", "datasets", "mistakes_spill.jsonl"))
+mistake_writer = MistakeWriter(spill_path=spill_path)
@@ -0,0 +1,180 @@
+import atexit
+import heapq
+import threading
+from collections import OrderedDict
+
+from database.session import SessionLocal, AsyncSessionLocal
+from context_engine.storage import load_learner, load_learner_async, learner_write_rows, write_learners
+
+class LearnerStateCache:
+    """
+    Write-behind cache for learner state.
+
+    Answers are applied to the in-memory LearnerRecord; dirty users are
+    written to the DB in one transaction every flush_interval seconds, or
+    sooner once flush_threshold users are dirty. Only the topics that changed
+    are upserted. drain() (wired to app shutdown and atexit) writes whatever
+    is still pending.
+
+    Each process owns its copy, so this assumes a learner's requests land on
+    the same worker (sticky sessions) or a single worker per DB.
+    """
+
+    def __init__(self, flush_interval=2.0, flush_threshold=500, max_entries=50000):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.max_entries = max_entries
+
+        self._states = OrderedDict()
+        self._dirty = set()
+        self._lock = threading.Lock()
+        # Serializes flushes so the timer and a threshold/drain flush never interleave
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.flushes = 0
+        self.rows_written = 0
+
+    # --- Lifecycle ---
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="learner-state-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def drain(self):
+        """Stops the background flusher and writes all pending updates."""
+        self._stopped.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=10)
+        self._thread = None
+        self.flush()
+
+    # --- Cache access ---
+    def _cached(self, user_id):
+        with self._lock:
+            record = self._states.get(user_id)
+            if record is not None:
+                self._states.move_to_end(user_id)
+            return record
+
+    def _insert(self, record):
+        with self._lock:
+            # Another request may have loaded the same user meanwhile; keep the first copy
+            existing = self._states.get(record.user_id)
+            if existing is not None:
+                return existing
+            self._states[record.user_id] = record
+            if record.dirty_topics:
+                self._dirty.add(record.user_id)
+            self._evict_clean()
+            return record
+
+    def _evict_clean(self):
+        # Only clean entries can go; dirty ones are still owed to the DB
+        if len(self._states) <= self.max_entries:
+            return
+        for user_id in list(self._states.keys()):
+            if len(self._states) <= self.max_entries:
+                break
+            if user_id not in self._dirty:
+                del self._states[user_id]
+
+    def load(self, user_id):
+        record = self._cached(user_id)
+        if record is not None:
+            return record
+
+        db = SessionLocal()
+        try:
+            record = load_learner(db, user_id)
+        finally:
+            db.close()
+        return self._insert(record)
+
+    async def load_async(self, user_id):
+        record = self._cached(user_id)
+        if record is not None:
+            return record
+
+        async with AsyncSessionLocal() as db:
+            record = await load_learner_async(db, user_id)
+        return self._insert(record)
+
+    def update(self, record, mutate):
+        """Runs mutate(record) under the cache lock and marks the user dirty."""
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            result = mutate(record)
+            self._dirty.add(record.user_id)
+            pending = len(self._dirty)
+        if pending >= self.flush_threshold:
+            self._wake.set()
+        return result
+
+    def weakest_topics(self, user_id, n):
+        """Weakest n (topic, mastery, attempts) from memory, or None if the user isn't cached."""
+        with self._lock:
+            record = self._states.get(user_id)
+            if record is None:
+                return None
+            weakest = heapq.nsmallest(n, record.topic_mastery.items(), key=lambda item: item[1])
+            return [(topic, mastery, record.topic_attempts.get(topic, 0)) for topic, mastery in weakest]
+
+    # --- Flushing ---
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                records = [self._states[uid] for uid in self._dirty if uid in self._states]
+                pending_topics = {r.user_id: set(r.dirty_topics) for r in records}
+                learner_rows, topic_rows = learner_write_rows(records)
+                for r in records:
+                    r.dirty_topics.clear()
+                self._dirty.clear()
+
+            db = SessionLocal()
+            try:
+                write_learners(db, learner_rows, topic_rows)
+                db.commit()
+            except Exception as e:
+                print(f"Error flushing learner state: {e}")
+                db.rollback()
+                # Put them back so the next flush retries
+                with self._lock:
+                    for r in records:
+                        r.dirty_topics.update(pending_topics[r.user_id])
+                        self._dirty.add(r.user_id)
+                return 0
+            finally:
+                db.close()
+
+            self.flushes += 1
+            self.rows_written += len(learner_rows) + len(topic_rows)
+            return len(learner_rows)
+
+    def stats(self):
+        return {
+            "cached": len(self._states),
+            "dirty": len(self._dirty),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written
+        }
+
+# Singleton instance
+state_cache = LearnerStateCache()
+atexit.register(state_cache.drain)
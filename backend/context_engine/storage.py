@@ -0,0 +1,132 @@
+import datetime
+
+from sqlalchemy import select
+
+from database.models import LearnerState, TopicMastery
+from database.upsert import upsert_statement
+
+DEFAULT_MASTERY = {"General": 0.5}
+
+class LearnerRecord:
+    """
+    In-memory view of one learner: the learner_state row plus their
+    topic_mastery rows. dirty_topics lists the topics changed since the last
+    write, so only those rows are upserted.
+    """
+
+    __slots__ = ("user_id", "topic_mastery", "topic_attempts", "confidence_avg",
+                 "error_pattern", "last_updated", "dirty_topics")
+
+    def __init__(self, user_id, topic_mastery=None, topic_attempts=None, confidence_avg=0.5,
+                 error_pattern=None, last_updated=None):
+        self.user_id = user_id
+        self.topic_mastery = topic_mastery if topic_mastery is not None else dict(DEFAULT_MASTERY)
+        self.topic_attempts = topic_attempts or {}
+        self.confidence_avg = confidence_avg if confidence_avg is not None else 0.5
+        self.error_pattern = error_pattern or []
+        self.last_updated = last_updated or datetime.datetime.utcnow()
+        self.dirty_topics = set()
+
+    def learner_row(self):
+        return {
+            "user_id": self.user_id,
+            "confidence_avg": self.confidence_avg,
+            "error_pattern": list(self.error_pattern),
+            "last_updated": self.last_updated
+        }
+
+    def topic_rows(self, topics):
+        return [{
+            "user_id": self.user_id,
+            "topic": topic,
+            "mastery": self.topic_mastery[topic],
+            "attempts": self.topic_attempts.get(topic, 0),
+            "last_seen": self.last_updated
+        } for topic in topics]
+
+def _record(user_id, state_row, topic_rows):
+    if state_row is None and not topic_rows:
+        record = LearnerRecord(user_id)
+        # Persist the starting topics too, so a reload sees the same map
+        record.dirty_topics.update(record.topic_mastery)
+        return record
+
+    mastery = {r.topic: r.mastery for r in topic_rows}
+    attempts = {r.topic: r.attempts for r in topic_rows}
+    legacy = not topic_rows and state_row is not None and state_row.topic_mastery
+    if legacy:
+        # Not migrated yet: start from the JSON blob and write it out as rows on the next save
+        mastery = dict(state_row.topic_mastery)
+    elif not topic_rows:
+        mastery = dict(DEFAULT_MASTERY)
+
+    record = LearnerRecord(
+        user_id,
+        topic_mastery=mastery,
+        topic_attempts=attempts,
+        confidence_avg=state_row.confidence_avg if state_row else None,
+        error_pattern=state_row.error_pattern if state_row else None,
+        last_updated=state_row.last_updated if state_row else None
+    )
+    if legacy:
+        record.dirty_topics.update(mastery)
+    return record
+
+def _learner_query(user_id):
+    return select(LearnerState).where(LearnerState.user_id == user_id)
+
+def _topics_query(user_id):
+    return select(TopicMastery).where(TopicMastery.user_id == user_id)
+
+# --- Reads ---
+def load_learner(db, user_id):
+    state_row = db.execute(_learner_query(user_id)).scalar_one_or_none()
+    topic_rows = db.execute(_topics_query(user_id)).scalars().all()
+    return _record(user_id, state_row, topic_rows)
+
+async def load_learner_async(db, user_id):
+    state_row = (await db.execute(_learner_query(user_id))).scalar_one_or_none()
+    topic_rows = (await db.execute(_topics_query(user_id))).scalars().all()
+    return _record(user_id, state_row, topic_rows)
+
+def weakest_topics_query(user_id, n):
+    # Served by ix_topic_mastery_user_mastery: an index range scan, no blob decoding
+    return (
+        select(TopicMastery.topic, TopicMastery.mastery, TopicMastery.attempts)
+        .where(TopicMastery.user_id == user_id)
+        .order_by(TopicMastery.mastery.asc())
+        .limit(n)
+    )
+
+# --- Writes ---
+def _statements(dialect_name):
+    learner_stmt = upsert_statement(
+        LearnerState, dialect_name, ["user_id"], ["confidence_avg", "error_pattern", "last_updated"]
+    )
+    topic_stmt = upsert_statement(
+        TopicMastery, dialect_name, ["user_id", "topic"], ["mastery", "attempts", "last_seen"]
+    )
+    return learner_stmt, topic_stmt
+
+def learner_write_rows(records):
+    """(learner rows, topic rows) for records, covering only their dirty topics."""
+    learner_rows = [r.learner_row() for r in records]
+    topic_rows = []
+    for r in records:
+        topic_rows.extend(r.topic_rows(r.dirty_topics))
+    return learner_rows, topic_rows
+
+def write_learners(db, learner_rows, topic_rows):
+    """Upserts learner and topic rows (two executemany round trips). Caller commits."""
+    learner_stmt, topic_stmt = _statements(db.get_bind().dialect.name)
+    if learner_rows:
+        db.execute(learner_stmt, learner_rows)
+    if topic_rows:
+        db.execute(topic_stmt, topic_rows)
+
+async def write_learners_async(db, learner_rows, topic_rows):
+    learner_stmt, topic_stmt = _statements(db.get_bind().dialect.name)
+    if learner_rows:
+        await db.execute(learner_stmt, learner_rows)
+    if topic_rows:
+        await db.execute(topic_stmt, topic_rows)
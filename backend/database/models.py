@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, JSON, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, JSON, DateTime, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -20,16 +20,42 @@ class Question(Base):
     correct = Column(String)
     misconception = Column(String)
     error_type = Column(String)
+    common_wrong = Column(JSON) # Optional list of frequent wrong options
+    source = Column(String) # Importer that produced the row, e.g. "medmcqa"
+    content_hash = Column(String) # Hash of normalized question + options, for cross-source dedupe
+    updated_at = Column(DateTime, default=func.now()) # Set on every upsert; lets caches detect changes
+
+    __table_args__ = (
+        # Selection pulls questions by topic and difficulty tier
+        Index("ix_questions_topic_difficulty", "topic", "difficulty"),
+        # Importers check each chunk's hashes against the table
+        Index("ix_questions_content_hash", "content_hash"),
+        # The bank polls max(updated_at) to notice imports
+        Index("ix_questions_updated_at", "updated_at"),
+    )
 
 class LearnerState(Base):
     __tablename__ = "learner_state"
     user_id = Column(Integer, primary_key=True) # Foreign key to user in real app
-    topic_mastery = Column(JSON) # { "Topic": 0.5 }
+    topic_mastery = Column(JSON) # Legacy { "Topic": 0.5 } blob; superseded by TopicMastery rows
     confidence_avg = Column(Float)
     error_pattern = Column(JSON)
     error_pattern = Column(JSON)
     last_updated = Column(DateTime, onupdate=func.now())
 
+class TopicMastery(Base):
+    __tablename__ = "topic_mastery"
+    user_id = Column(Integer, primary_key=True) # (user_id, topic) PK doubles as the lookup index
+    topic = Column(String, primary_key=True)
+    mastery = Column(Float, nullable=False, default=0.5)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_seen = Column(DateTime)
+
+    __table_args__ = (
+        # Weakest-N topics per learner without scanning all their rows
+        Index("ix_topic_mastery_user_mastery", "user_id", "mastery"),
+    )
+
 class Mistake(Base):
     __tablename__ = "mistakes"
     id = Column(Integer, primary_key=True, index=True)
@@ -40,3 +66,13 @@ class Mistake(Base):
     user_answer = Column(String)
     correct_answer = Column(String)
     timestamp = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        # Mistake notebook: one learner's mistakes, newest first, paginated
+        Index("ix_mistakes_user_timestamp", "user_id", "timestamp"),
+    )
+
+class IdSequence(Base):
+    __tablename__ = "id_sequences"
+    name = Column(String, primary_key=True) # e.g. "mistakes"
+    next_id = Column(Integer, nullable=False)
@@ -0,0 +1,60 @@
+import threading
+
+from sqlalchemy import func, select, update
+
+from database.models import IdSequence
+from database.upsert import upsert_statement
+
+class IdAllocator:
+    """
+    Hands out primary keys before the row is written, so an endpoint can
+    return a real id while the INSERT happens later in a batch.
+
+    Ids are reserved from the id_sequences table in blocks, with one
+    UPDATE ... RETURNING per block, so several workers never collide.
+    A block's unused ids are skipped after a restart.
+    """
+
+    def __init__(self, session_factory, name, model, block_size=1000):
+        self.session_factory = session_factory
+        self.name = name
+        self.model = model
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def _reserve_block(self):
+        db = self.session_factory()
+        try:
+            # First use: start after whatever the table already holds
+            max_id = db.execute(select(func.max(self.model.id))).scalar() or 0
+            db.execute(
+                upsert_statement(IdSequence, db.get_bind().dialect.name, ["name"]),
+                [{"name": self.name, "next_id": max_id + 1}]
+            )
+            end = db.execute(
+                update(IdSequence)
+                .where(IdSequence.name == self.name)
+                .values(next_id=IdSequence.next_id + self.block_size)
+                .returning(IdSequence.next_id)
+            ).scalar_one()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return end - self.block_size, end
+
+    def has_reserved(self):
+        """True when next_id() can be served from memory without a DB round trip."""
+        return self._next < self._end
+
+    def next_id(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self._reserve_block()
+            value = self._next
+            self._next += 1
+            return value
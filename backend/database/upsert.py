@@ -0,0 +1,25 @@
+from sqlalchemy import case
+from sqlalchemy.dialects import postgresql, sqlite
+
+def upsert_statement(model, dialect_name, index_elements, update_columns=None, keep_when=None, keep_columns=()):
+    """
+    INSERT ... ON CONFLICT for SQLite and PostgreSQL.
+    Execute it with a list of row dicts for a single executemany round trip.
+    update_columns=None turns it into ON CONFLICT DO NOTHING.
+
+    keep_when(excluded, table) -> SQL condition: where it holds, keep_columns
+    keep their stored value instead of taking the incoming one.
+    """
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    table = model.__table__
+    stmt = insert(table)
+    if not update_columns:
+        return stmt.on_conflict_do_nothing(index_elements=index_elements)
+    keep = keep_when(stmt.excluded, table) if keep_when is not None else None
+    set_ = {}
+    for col in update_columns:
+        if keep is not None and col in keep_columns:
+            set_[col] = case((keep, table.c[col]), else_=stmt.excluded[col])
+        else:
+            set_[col] = stmt.excluded[col]
+    return stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
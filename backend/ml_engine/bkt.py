@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+# Bayesian Knowledge Tracing: mastery of a topic is P(known), updated after
+# each graded answer from four per-topic parameters:
+#   p_init    prior P(known) for a topic the learner hasn't touched
+#   p_transit P(learning it) on each practice opportunity
+#   p_slip    P(wrong | known)
+#   p_guess   P(right | not known); ~1/options for MCQs
+P_INIT, P_TRANSIT, P_SLIP, P_GUESS = range(4)
+PARAM_NAMES = ("p_init", "p_transit", "p_slip", "p_guess")
+
+# 0.5 prior matches the mastery new topics have always started from; 4-option MCQs
+DEFAULT_PARAMS = (0.5, 0.1, 0.1, 0.25)
+
+# P(known) is kept strictly inside (0, 1): at exactly 1.0 the wrong-answer
+# posterior is 1.0 too, so a saturated learner could never lose mastery
+P_MIN, P_MAX = 1e-6, 1 - 1e-6
+
+BKT_PARAMS_PATH = os.getenv(
+    "BKT_PARAMS_PATH", os.path.join(os.path.dirname(__file__), '..', 'datasets', 'bkt_params.json')
+)
+
+class BKTModel:
+    """
+    Per-topic BKT parameters in one (topics x 4) float64 array, topic -> row in
+    a dict. Rows for unseen topics are appended with the defaults (capacity
+    doubles, so adding is amortized O(1)).
+
+    update() is the online path: O(1) scalar math per answer, no allocation.
+    update_batch() / rescore() run the same recurrence over NumPy arrays, for
+    re-scoring many learners' histories at once (e.g. after refitting parameters).
+    """
+
+    def __init__(self, params=None, default=DEFAULT_PARAMS, capacity=256):
+        self.default = tuple(float(p) for p in default)
+        self.topic_index = {}
+        self._params = np.empty((capacity, 4), dtype=np.float64)
+        # Plain-float copies of each row for the scalar hot path (NumPy scalar reads cost more than the math)
+        self._rows = []
+        self._lock = threading.Lock()
+        for topic, values in (params or {}).items():
+            self.set_params(topic, values)
+
+    # --- Parameters ---
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def params(self):
+        """(topics x 4) view of the live parameters, rows in topic_index order."""
+        return self._params[:len(self._rows)]
+
+    def topic_id(self, topic):
+        index = self.topic_index.get(topic)
+        if index is not None:
+            return index
+        with self._lock:
+            index = self.topic_index.get(topic)
+            if index is None:
+                index = self._append(self.default)
+                self.topic_index[topic] = index
+            return index
+
+    def _append(self, values):
+        index = len(self._rows)
+        if index == len(self._params):
+            grown = np.empty((2 * len(self._params), 4), dtype=np.float64)
+            grown[:index] = self._params[:index]
+            self._params = grown
+        self._params[index] = values
+        self._rows.append(tuple(float(v) for v in values))
+        return index
+
+    def set_params(self, topic, values):
+        if isinstance(values, dict):
+            values = [values.get(name, default) for name, default in zip(PARAM_NAMES, self.default)]
+        values = tuple(float(v) for v in values)
+        index = self.topic_id(topic)
+        with self._lock:
+            self._params[index] = values
+            self._rows[index] = values
+
+    def prior(self, topic):
+        return self._rows[self.topic_id(topic)][P_INIT]
+
+    # --- Online update ---
+    def update(self, p_known, topic, is_correct):
+        """P(known) after one graded answer on `topic`, given P(known) before it."""
+        _, transit, slip, guess = self._rows[self.topic_id(topic)]
+        p_known = min(max(p_known, P_MIN), P_MAX)
+        if is_correct:
+            evidence = p_known * (1 - slip)
+            posterior = evidence / (evidence + (1 - p_known) * guess)
+        else:
+            evidence = p_known * slip
+            posterior = evidence / (evidence + (1 - p_known) * (1 - guess))
+        return min(max(posterior + (1 - posterior) * transit, P_MIN), P_MAX)
+
+    def predict_correct(self, p_known, topic):
+        """P(next answer on `topic` is right) at this mastery."""
+        _, _, slip, guess = self._rows[self.topic_id(topic)]
+        return p_known * (1 - slip) + (1 - p_known) * guess
+
+    # --- Vectorized ---
+    def topic_ids(self, topics):
+        return np.fromiter((self.topic_id(t) for t in topics), dtype=np.int64, count=len(topics))
+
+    def update_batch(self, p_known, topic_ids, correct):
+        """
+        One BKT step for many (learner, topic) states at once.
+        p_known float array, topic_ids int array (rows of params), correct bool array.
+        Returns the new P(known) array.
+        """
+        p_known = np.clip(p_known, P_MIN, P_MAX)
+        params = self._params[topic_ids]
+        transit, slip, guess = params[:, P_TRANSIT], params[:, P_SLIP], params[:, P_GUESS]
+        right = p_known * (1 - slip)
+        wrong = p_known * slip
+        posterior = np.where(
+            correct,
+            right / (right + (1 - p_known) * guess),
+            wrong / (wrong + (1 - p_known) * (1 - guess))
+        )
+        return np.clip(posterior + (1 - posterior) * transit, P_MIN, P_MAX)
+
+    def rescore(self, sequence_ids, topic_ids, correct, start=None):
+        """
+        Replays whole answer histories, vectorized across sequences.
+
+        A sequence is one (learner, topic) history; inputs are flat arrays, one
+        entry per answer, sorted by sequence id and then time, with sequence ids
+        0..n-1. The loop runs once per answer position (the longest history),
+        each step updating every sequence that has an answer there.
+
+        start: initial P(known) per sequence (default: the topic's p_init).
+        Returns (final P(known) per sequence, log-likelihood of the answers).
+        """
+        sequence_ids = np.asarray(sequence_ids, dtype=np.int64)
+        topic_ids = np.asarray(topic_ids, dtype=np.int64)
+        correct = np.asarray(correct, dtype=bool)
+        n_sequences = int(sequence_ids[-1]) + 1 if len(sequence_ids) else 0
+
+        # Position of each answer within its sequence
+        starts = np.searchsorted(sequence_ids, np.arange(n_sequences))
+        position = np.arange(len(sequence_ids)) - starts[sequence_ids]
+        seq_topics = topic_ids[starts]
+
+        p_known = np.clip(np.array(start, dtype=np.float64) if start is not None
+                          else self._params[seq_topics, P_INIT], P_MIN, P_MAX)
+        log_likelihood = 0.0
+        order = np.argsort(position, kind="stable")
+        steps = np.searchsorted(position[order], np.arange(int(position.max()) + 2 if len(position) else 1))
+        for step in range(len(steps) - 1):
+            rows = order[steps[step]:steps[step + 1]]
+            seqs = sequence_ids[rows]
+            observed = correct[rows]
+            params = self._params[seq_topics[seqs]]
+            p = p_known[seqs]
+            p_right = p * (1 - params[:, P_SLIP]) + (1 - p) * params[:, P_GUESS]
+            log_likelihood += float(np.log(np.where(observed, p_right, 1 - p_right)).sum())
+            p_known[seqs] = self.update_batch(p, seq_topics[seqs], observed)
+        return p_known, log_likelihood
+
+    # --- Persistence ---
+    def to_dict(self):
+        return {topic: dict(zip(PARAM_NAMES, self._rows[index])) for topic, index in self.topic_index.items()}
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"default": dict(zip(PARAM_NAMES, self.default)), "topics": self.to_dict()}, f, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Parameters from a JSON file written by save(); defaults only if it is missing or unreadable."""
+        if not path or not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            default = data.get("default") or {}
+            default = tuple(default.get(name, value) for name, value in zip(PARAM_NAMES, DEFAULT_PARAMS))
+            model = cls(data.get("topics"), default=default)
+            print(f"Loaded BKT parameters for {len(model)} topics from {path}")
+            return model
+        except Exception as e:
+            print(f"Error loading BKT parameters from {path}: {e}. Using defaults.")
+            return cls()
+
+# Singleton instance
+knowledge_tracer = BKTModel.load(BKT_PARAMS_PATH)
@@ -1,12 +1,11 @@
 import random
-import json
-import os
 
-def decide_next_step(learner_state):
+from ml_engine.selector import selector
+
+def decide_next_step(learner_state, user_id=None):
     """
     Decides the next question or action based on learner state.
     """
-    # Simple logic for prototype:
     # If mastery is low, give easier question.
     # If mastery is high, give harder question.
     # If error pattern suggests misconception, flag need_explanation.
@@ -14,33 +13,11 @@ def decide_next_step(learner_state):
     # Mock decision
     need_explanation = False
     
-    # Load questions from the expanded dataset
-    try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        dataset_path = os.path.join(current_dir, "..", "datasets", "questions.json")
-        
-        with open(dataset_path, 'r', encoding='utf-8') as f:
-            question_bank = json.load(f)
-            
-    except Exception as e:
-        print(f"Error loading questions DB: {e}. Falling back to emergency bank.")
-        question_bank = [
-            {
-                "id": "FALLBACK_001", 
-                "question": "What is the powerhouse of the cell?", 
-                "options": ["Mitochondria", "Nucleus", "Ribosome", "Golgi"], 
-                "correct": "Mitochondria", 
-                "topic": "Cell Biology", 
-                 "difficulty": 1
-            }
-        ]
-    
-    # Adaptive Logic Simulation:
-    # 1. Filter by Difficulty based on Learner Confidence (Mock)
-    # 2. Filter by Topic if specified (Mock)
-    
-    # For now, purely random selection from the 1500+ bank
-    next_question = random.choice(question_bank)
+    # Adaptive selection from the in-memory bank:
+    # 1. Target the learner's weakest topics (topic_mastery)
+    # 2. Pick a difficulty tier from mastery + confidence_avg
+    # 3. Skip questions this user has seen recently
+    next_question = selector.select(learner_state, user_id=user_id)
     
     # Randomly trigger explanation for demo purposes
     if random.random() < 0.2:
@@ -50,3 +27,13 @@ def decide_next_step(learner_state):
         "question": next_question,
         "need_explanation": need_explanation
     }
+
+def plan_session(learner_state, length, user_id=None):
+    """
+    An ordered batch of `length` questions for one sitting, chosen from the
+    current mastery the same way decide_next_step picks one at a time.
+    Ordered easiest first so a session ramps up instead of opening on its hardest item.
+    """
+    questions = selector.select_many(learner_state, length, user_id=user_id)
+    # sorted() is stable: within a tier the selector's order (weakest topics weighted) is kept
+    return sorted(questions, key=lambda q: q.get("difficulty") or 0)
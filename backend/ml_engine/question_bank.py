@@ -0,0 +1,275 @@
+import json
+import os
+import random
+import threading
+import time
+
+from database.session import SessionLocal
+from ml_engine.question_store import UNSOLVED, bank_signature, load_questions
+
+# Used when the dataset cannot be read so the quiz flow never dead-ends
+FALLBACK_QUESTIONS = [
+    {
+        "id": "FALLBACK_001",
+        "question": "What is the powerhouse of the cell?",
+        "options": ["Mitochondria", "Nucleus", "Ribosome", "Golgi"],
+        "correct": "Mitochondria",
+        "topic": "Cell Biology",
+        "difficulty": 1
+    }
+]
+
+# Answer-revealing fields; graded on the server, never sent with a question
+PRIVATE_FIELDS = ("correct", "misconception")
+# What the client renders; everything else (answer key, import metadata) stays on the server
+PUBLIC_FIELDS = ("id", "topic", "difficulty", "question", "options")
+
+def public_question(q):
+    """A question as shown to the learner: only the fields the client needs, never the answer key."""
+    if q is None:
+        return None
+    return {k: q[k] for k in PUBLIC_FIELDS if k in q}
+
+class QuestionBank:
+    """
+    Process-wide, in-memory view of the question bank.
+
+    With a session_factory the bank is warmed from the questions table and
+    rebuilt when its (row count, last update) signature changes, so inserts,
+    updates and deletes are all picked up; until the table has rows it serves
+    questions.json instead. Without one it reads questions.json directly and
+    reloads when the file's mtime changes.
+    Either way lookups hit precomputed indexes by id, topic and difficulty.
+    """
+
+    def __init__(self, dataset_path, check_interval=1.0, session_factory=None):
+        self.dataset_path = dataset_path
+        self.session_factory = session_factory
+        # Seconds between change checks, so hot paths don't stat()/query on every call
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._signature = None
+        self._last_check = 0.0
+        self._refreshing = False
+
+        self.questions = []
+        self.by_id = {}
+        # Questions with a known answer: the pool selection draws from
+        self.servable = []
+        # question_id -> correct option, for O(1) grading
+        self.answer_key = {}
+        self.by_topic = {}
+        self.by_difficulty = {}
+        self.by_topic_difficulty = {}
+        self.topic_list = []
+        self.difficulties_by_topic = {}
+        # Bumped on every (re)build so derived structures know when to refresh
+        self.version = 0
+
+    @classmethod
+    def from_questions(cls, questions):
+        """Builds a bank from an in-memory list (no file, no reloads)."""
+        bank = cls(None)
+        bank._build(questions)
+        return bank
+
+    # --- Loading ---
+    def refresh(self):
+        """
+        Cheap enough for hot paths, including the event loop: the first call
+        loads synchronously (the API warms the bank at startup), after that a
+        change check is started on a background thread at most once per
+        check_interval and the finished indexes are swapped in.
+        """
+        if self.dataset_path is None and self.session_factory is None:
+            return
+        if not self.version:
+            with self._lock:
+                if not self.version:
+                    self._last_check = time.monotonic()
+                    self._reload()
+            return
+
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval or self._refreshing:
+            return
+        with self._lock:
+            if now - self._last_check < self.check_interval or self._refreshing:
+                return
+            self._last_check = now
+            self._refreshing = True
+        threading.Thread(target=self._background_reload, name="question-bank-refresh", daemon=True).start()
+
+    def _background_reload(self):
+        try:
+            with self._lock:
+                self._reload()
+        finally:
+            self._refreshing = False
+
+    def _reload(self):
+        if self.session_factory is not None and self._refresh_db():
+            return
+        self._refresh_file()
+
+    def _refresh_db(self):
+        """Reloads from the questions table if it changed. False if the table can't serve the bank."""
+        try:
+            db = self.session_factory()
+            try:
+                signature = bank_signature(db)
+                if signature is None:
+                    return False
+                if signature != self._signature:
+                    self._build(load_questions(db))
+                    self._signature = signature
+                    print(f"Question bank loaded from DB: {len(self.questions)} questions.")
+            finally:
+                db.close()
+            return True
+        except Exception as e:
+            print(f"Error loading questions from DB: {e}")
+            # Keep serving what we have; fall back to the file only if nothing is loaded
+            return bool(self.questions) and self._signature is not None
+
+    def _refresh_file(self):
+        if self.dataset_path is None:
+            if not self.questions:
+                self._build(FALLBACK_QUESTIONS)
+            return
+        try:
+            mtime = os.stat(self.dataset_path).st_mtime_ns
+        except OSError as e:
+            if self._mtime is None:
+                print(f"Error loading questions DB: {e}. Falling back to emergency bank.")
+                self._build(FALLBACK_QUESTIONS)
+                self._mtime = -1
+            return
+
+        if mtime != self._mtime:
+            self._load(mtime)
+
+    def _load(self, mtime):
+        try:
+            with open(self.dataset_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._build(data)
+            print(f"Question bank loaded: {len(self.questions)} questions.")
+        except Exception as e:
+            print(f"Error loading questions DB: {e}. Falling back to emergency bank.")
+            if not self.questions:
+                self._build(FALLBACK_QUESTIONS)
+        # Record the mtime even on failure so a broken file isn't re-parsed every check
+        self._mtime = mtime
+
+    def _build(self, data):
+        by_id = {}
+        answer_key = {}
+        by_topic = {}
+        by_difficulty = {}
+        by_topic_difficulty = {}
+
+        servable = []
+
+        for q in data:
+            topic = q.get("topic", "General")
+            difficulty = q.get("difficulty", 3)
+            by_id[q["id"]] = q
+            answer = q.get("correct")
+            # Without a real answer key a question can be neither graded nor served
+            if answer is None or answer == UNSOLVED:
+                continue
+            servable.append(q)
+            answer_key[q["id"]] = answer
+            by_topic.setdefault(topic, []).append(q)
+            by_difficulty.setdefault(difficulty, []).append(q)
+            by_topic_difficulty.setdefault((topic, difficulty), []).append(q)
+
+        difficulties_by_topic = {}
+        for (topic, difficulty) in by_topic_difficulty:
+            difficulties_by_topic.setdefault(topic, []).append(difficulty)
+        difficulties_by_topic = {t: sorted(ds) for t, ds in difficulties_by_topic.items()}
+
+        # Everything is built above; swap whole structures in so lock-free
+        # readers never see a half-built index
+        self.questions = list(data)
+        self.servable = servable
+        self.by_id = by_id
+        self.answer_key = answer_key
+        self.by_topic = by_topic
+        self.by_difficulty = by_difficulty
+        self.by_topic_difficulty = by_topic_difficulty
+        self.topic_list = list(by_topic.keys())
+        self.difficulties_by_topic = difficulties_by_topic
+        self.version += 1
+
+    # --- Lookups ---
+    def all(self):
+        self.refresh()
+        return self.questions
+
+    def get(self, question_id):
+        self.refresh()
+        return self.by_id.get(question_id)
+
+    def correct_answer(self, question_id):
+        self.refresh()
+        return self.answer_key.get(question_id)
+
+    def grade(self, question_id, answer):
+        """True/False against the answer key, or None if the question isn't in the bank or is unsolved."""
+        self.refresh()
+        if question_id not in self.answer_key:
+            return None
+        return answer == self.answer_key[question_id]
+
+    def topics(self):
+        self.refresh()
+        return list(self.by_topic.keys())
+
+    def difficulties(self):
+        self.refresh()
+        return sorted(self.by_difficulty.keys())
+
+    def for_topic(self, topic):
+        self.refresh()
+        return self.by_topic.get(topic, [])
+
+    def for_difficulty(self, difficulty):
+        self.refresh()
+        return self.by_difficulty.get(difficulty, [])
+
+    def for_topic_difficulty(self, topic, difficulty):
+        self.refresh()
+        return self.by_topic_difficulty.get((topic, difficulty), [])
+
+    def random_question(self, topic=None, difficulty=None):
+        self.refresh()
+        if topic is not None and difficulty is not None:
+            pool = self.by_topic_difficulty.get((topic, difficulty), [])
+        elif topic is not None:
+            pool = self.by_topic.get(topic, [])
+        elif difficulty is not None:
+            pool = self.by_difficulty.get(difficulty, [])
+        else:
+            pool = self.servable
+        return random.choice(pool) if pool else None
+
+    def __len__(self):
+        self.refresh()
+        return len(self.questions)
+
+# Singleton instance
+current_dir = os.path.dirname(os.path.abspath(__file__))
+dataset_path = os.path.join(current_dir, "..", "datasets", "questions.json")
+
+# "db" serves the bank from the questions table (seeded from questions.json on
+# first startup); "json" reads the file directly, e.g. for offline scripts
+QUESTION_SOURCE = os.getenv("QUESTION_SOURCE", "db")
+
+# Loaded lazily on first lookup, then kept in sync with the table or the file
+question_bank = QuestionBank(
+    dataset_path,
+    session_factory=SessionLocal if QUESTION_SOURCE == "db" else None
+)
@@ -0,0 +1,287 @@
+import itertools
+import json
+import os
+import sqlite3
+import time
+
+from ml_engine.question_store import content_hash, existing_hashes, upsert_questions
+
+class Checkpoint:
+    """
+    Import progress on disk: how many source rows have been consumed and
+    committed. Saved after every chunk (temp file + os.replace), so an
+    interrupted run resumes at the last committed chunk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.position = 0
+        self.counts = {}
+
+    def load(self):
+        if self.path and os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.position = data.get("position", 0)
+            self.counts = data.get("counts", {})
+        return self
+
+    def save(self, position, counts):
+        self.position = position
+        self.counts = dict(counts)
+        if not self.path:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"position": position, "counts": self.counts}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+class StageStats:
+    """Rows handled and busy seconds per pipeline stage, for throughput reports."""
+
+    def __init__(self):
+        self.rows = {}
+        self.seconds = {}
+
+    def add(self, stage, rows, seconds):
+        self.rows[stage] = self.rows.get(stage, 0) + rows
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def report(self, wall_seconds):
+        for stage, rows in self.rows.items():
+            busy = self.seconds.get(stage, 0.0)
+            busy_rate = f"{rows / busy:.0f} rows/s busy" if busy > 0 else "n/a"
+            print(f"  {stage:<10} {rows:>10} rows  {rows / max(wall_seconds, 1e-9):>10.0f} rows/s wall  "
+                  f"({busy:.2f}s busy, {busy_rate})")
+
+class DBSink:
+    """
+    Upserts chunks into the questions table, one transaction per chunk.
+    Duplicates are checked against the table's content_hash index chunk by
+    chunk, so memory does not grow with the corpus.
+    """
+
+    def __init__(self, session_factory, batch_size=1000):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, items):
+        """Writes items, skipping content already stored under another id. Returns (written, duplicates)."""
+        db = self.session_factory()
+        try:
+            hashed = [(content_hash(item), item) for item in items]
+            known = existing_hashes(db, {h for h, _ in hashed})
+            fresh = []
+            for h, item in hashed:
+                owner = known.get(h)
+                if owner is not None and owner != item["id"]:
+                    continue
+                known[h] = item["id"]
+                fresh.append(item)
+            upsert_questions(db, fresh, batch_size=self.batch_size)
+            db.commit()
+            return len(fresh), len(items) - len(fresh)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+class JsonlSink:
+    """
+    Appends chunks to a JSON Lines file, one question per line.
+    Ids and content hashes already written live in a SQLite sidecar
+    (<path>.index), checked chunk by chunk like DBSink does against the
+    table, so a resumed run never writes a line twice and memory stays flat.
+    The sidecar remembers how far into the file it has indexed; lines past
+    that (a missing sidecar, or a crash before it committed) are indexed on open.
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or f"{path}.index"
+        self._file = None
+        self._index = None
+
+    def __enter__(self):
+        self._index = sqlite3.connect(self.index_path)
+        self._index.executescript(
+            "CREATE TABLE IF NOT EXISTS ids (id TEXT PRIMARY KEY);"
+            "CREATE TABLE IF NOT EXISTS hashes (hash TEXT PRIMARY KEY);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);"
+        )
+        self._catch_up()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+        self._index.close()
+        return False
+
+    def _indexed_offset(self):
+        row = self._index.execute("SELECT value FROM meta WHERE key = 'offset'").fetchone()
+        return row[0] if row else 0
+
+    def _record(self, keys, offset):
+        self._index.executemany("INSERT OR IGNORE INTO ids VALUES (?)", [(i,) for i, _ in keys])
+        self._index.executemany("INSERT OR IGNORE INTO hashes VALUES (?)", [(h,) for _, h in keys])
+        self._index.execute("INSERT OR REPLACE INTO meta VALUES ('offset', ?)", (offset,))
+        self._index.commit()
+
+    def _catch_up(self, batch_size=10000):
+        if not os.path.exists(self.path):
+            return
+        offset = self._indexed_offset()
+        if offset >= os.path.getsize(self.path):
+            return
+        torn = False
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            keys = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    torn = True
+                    break
+                offset += len(line)
+                if line.strip():
+                    item = json.loads(line)
+                    keys.append((item["id"], content_hash(item)))
+                if len(keys) >= batch_size:
+                    self._record(keys, offset)
+                    keys = []
+            self._record(keys, offset)
+        if torn:
+            # Half-written line from a crash; its chunk was never checkpointed, so it is re-read
+            os.truncate(self.path, offset)
+
+    def _known(self, table, column, values):
+        found = set()
+        values = list(values)
+        for i in range(0, len(values), 500): # stay under SQLite's bound-variable limit
+            part = values[i:i + 500]
+            marks = ",".join("?" * len(part))
+            found.update(r[0] for r in self._index.execute(
+                f"SELECT {column} FROM {table} WHERE {column} IN ({marks})", part))
+        return found
+
+    def write(self, items):
+        hashed = [(item["id"], content_hash(item), item) for item in items]
+        seen_ids = self._known("ids", "id", {i for i, _, _ in hashed})
+        seen_hashes = self._known("hashes", "hash", {h for _, h, _ in hashed})
+        keys = []
+        for item_id, h, item in hashed:
+            if item_id in seen_ids or h in seen_hashes:
+                continue
+            seen_ids.add(item_id)
+            seen_hashes.add(h)
+            keys.append((item_id, h))
+            self._file.write(json.dumps(item, ensure_ascii=False) + "\n")
+        # On disk before the checkpoint moves past this chunk
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._record(keys, self._file.tell())
+        return len(keys), len(items) - len(keys)
+
+def import_stream(open_rows, convert, sink, checkpoint, chunk_size=1000, limit=None, report_every=10000,
+                  stats=None):
+    """
+    Streams source rows through convert(position, row) -> question dict or
+    None (rejected), writing accepted questions to sink in chunks.
+
+    open_rows(start) must return an iterator over the source, in a stable
+    order, beginning at row `start` (the checkpoint position on resume).
+    Peak memory is one chunk. Returns the counts dict; stats (a StageStats)
+    collects per-stage timings when given.
+    """
+    stats = stats or StageStats()
+    counts = {"read": 0, "rejected": 0, "duplicates": 0, "written": 0}
+    counts.update(checkpoint.counts)
+    start = checkpoint.position
+    end = None if limit is None else max(start, limit)
+    if start:
+        print(f"Resuming at row {start} ({counts['written']} written so far)")
+
+    started = time.monotonic()
+    last_report = start
+    position = start
+    chunk = []
+
+    def flush():
+        write_started = time.monotonic()
+        written, duplicates = sink.write(chunk)
+        stats.add("written", written, time.monotonic() - write_started)
+        counts["written"] += written
+        counts["duplicates"] += duplicates
+        chunk.clear()
+        checkpoint.save(position, counts)
+
+    rows = open_rows(start)
+    if end is not None:
+        rows = itertools.islice(rows, end - start)
+    for row in rows:
+        item = convert(position, row)
+        position += 1
+        counts["read"] += 1
+        if item is None:
+            counts["rejected"] += 1
+            stats.add("rejected", 1, 0.0)
+        else:
+            chunk.append(item)
+        if len(chunk) >= chunk_size:
+            flush()
+        if position - last_report >= report_every:
+            last_report = position
+            rate = (position - start) / max(time.monotonic() - started, 1e-9)
+            print(f"  {position} rows | {counts['written']} written | {counts['duplicates']} dupes | "
+                  f"{counts['rejected']} rejected | {rate:.0f} rows/s")
+
+    flush()
+    return counts
+
+# --- CLI plumbing shared by the import scripts ---
+def add_import_arguments(parser, default_checkpoint):
+    parser.add_argument("--output", default="db",
+                        help='"db" to upsert into the questions table, or a .jsonl path to append to')
+    parser.add_argument("--checkpoint", default=default_checkpoint, help="Progress file for resuming")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from row 0")
+    parser.add_argument("--chunk_size", type=int, default=1000, help="Rows per write/checkpoint")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many source rows")
+
+def open_sink(output):
+    if output == "db":
+        from database.session import SessionLocal, engine
+        from database.models import Base
+        from ml_engine.question_store import ensure_question_table
+
+        ensure_question_table(engine)
+        Base.metadata.create_all(bind=engine)
+        return DBSink(SessionLocal)
+    return JsonlSink(output)
+
+def run_import(args, open_rows, convert, label, stats=None):
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.restart:
+        checkpoint.clear()
+    checkpoint.load()
+
+    stats = stats or StageStats()
+    started = time.monotonic()
+    with open_sink(args.output) as sink:
+        counts = import_stream(open_rows, convert, sink, checkpoint,
+                               chunk_size=args.chunk_size, limit=args.limit, stats=stats)
+    elapsed = time.monotonic() - started
+    print(f"{label}: {counts['read']} rows read, {counts['written']} written, "
+          f"{counts['duplicates']} duplicates, {counts['rejected']} rejected ({elapsed:.1f}s this run)")
+    stats.report(elapsed)
+    return counts
@@ -0,0 +1,157 @@
+import datetime
+import hashlib
+import json
+
+from sqlalchemy import select, func, inspect, text, or_, and_
+
+from database.models import Question
+from database.upsert import upsert_statement
+
+# questions.json keys <-> Question columns ("question" is stored as text)
+OPTIONAL_FIELDS = ("misconception", "error_type", "common_wrong", "source")
+UPDATE_COLUMNS = ["topic", "difficulty", "text", "options", "correct", "misconception",
+                  "error_type", "common_wrong", "source", "content_hash", "updated_at"]
+# Placeholder answer key for imported questions nobody has solved yet
+UNSOLVED = "Unknown"
+# Filled in by the solver; a re-import of the same question without a key must not wipe them
+SOLVED_COLUMNS = ("correct", "misconception", "difficulty", "error_type")
+
+def _is_unsolved(column):
+    return or_(column.is_(None), column == UNSOLVED)
+
+def keep_solved(excluded, table):
+    """Incoming row is an unsolved copy of the same question the table already has solved."""
+    return and_(
+        _is_unsolved(excluded.correct),
+        ~_is_unsolved(table.c.correct),
+        excluded.content_hash == table.c.content_hash
+    )
+
+def content_hash(item):
+    """Same question under a different id (or from another source) hashes the same."""
+    normalized = " ".join(item.get("question", "").lower().split())
+    options = "\x1f".join(" ".join(str(o).lower().split()) for o in item.get("options", []))
+    return hashlib.sha1(f"{normalized}\x1e{options}".encode('utf-8')).hexdigest()
+
+def question_row(item, now=None):
+    """A questions.json-style dict as a row for the questions table."""
+    return {
+        "id": item["id"],
+        "topic": item.get("topic", "General"),
+        "difficulty": item.get("difficulty", 3),
+        "text": item.get("question", ""),
+        "options": item.get("options", []),
+        "correct": item.get("correct"),
+        "misconception": item.get("misconception"),
+        "error_type": item.get("error_type"),
+        "common_wrong": item.get("common_wrong"),
+        "source": item.get("source"),
+        "content_hash": content_hash(item),
+        "updated_at": now or datetime.datetime.utcnow()
+    }
+
+def question_item(row):
+    """A Question row in the dict shape the bank, selector and RAG code use."""
+    item = {
+        "id": row.id,
+        "topic": row.topic,
+        "difficulty": row.difficulty,
+        "question": row.text,
+        "options": row.options or [],
+        "correct": row.correct
+    }
+    for field in OPTIONAL_FIELDS:
+        value = getattr(row, field)
+        if value is not None:
+            item[field] = value
+    return item
+
+def ensure_question_table(engine):
+    """
+    Creates the questions table, or adds columns introduced since it was
+    created (all nullable, so ALTER TABLE ADD COLUMN works on SQLite and PostgreSQL).
+    """
+    table = Question.__table__
+    inspector = inspect(engine)
+    if not inspector.has_table(table.name):
+        table.create(bind=engine)
+        return
+    existing = {c["name"] for c in inspector.get_columns(table.name)}
+    missing = [c for c in table.columns if c.name not in existing]
+    if not missing:
+        return
+    with engine.begin() as conn:
+        for column in missing:
+            column_type = column.type.compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+    print(f"Added columns to {table.name}: {', '.join(c.name for c in missing)}")
+
+# --- Writes ---
+def upsert_questions(db, items, batch_size=1000):
+    """
+    Inserts or updates questions by id in executemany batches. Caller commits.
+    An unsolved copy never overwrites a solved answer key (see keep_solved).
+    Returns the number of rows written.
+    """
+    stmt = upsert_statement(Question, db.get_bind().dialect.name, ["id"], UPDATE_COLUMNS,
+                            keep_when=keep_solved, keep_columns=SOLVED_COLUMNS)
+    now = datetime.datetime.utcnow()
+    written = 0
+    batch = []
+    for item in items:
+        batch.append(question_row(item, now))
+        if len(batch) >= batch_size:
+            db.execute(stmt, batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        db.execute(stmt, batch)
+        written += len(batch)
+    return written
+
+def seed_from_json(db, path):
+    """Loads questions.json into an empty questions table. Returns rows inserted."""
+    if count_questions(db) > 0:
+        return 0
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    written = upsert_questions(db, data)
+    db.commit()
+    return written
+
+# --- Reads ---
+def count_questions(db):
+    return db.execute(select(func.count()).select_from(Question)).scalar()
+
+def existing_hashes(db, hashes):
+    """{content_hash: id} for the given hashes already in the table (index lookups)."""
+    if not hashes:
+        return {}
+    query = select(Question.content_hash, Question.id).where(Question.content_hash.in_(list(hashes)))
+    return dict(db.execute(query).all())
+
+def bank_signature(db):
+    """
+    (row count, latest updated_at), or None for an empty table. Every importer
+    write bumps updated_at; the count catches deletes, which leave it alone.
+    One round trip over ix_questions_updated_at: the max is an index probe, the
+    count a covering-index scan (a few ms at 1M rows, on the refresh thread).
+    """
+    count, updated_at = db.execute(
+        select(select(func.count()).select_from(Question).scalar_subquery(),
+               select(func.max(Question.updated_at)).scalar_subquery())
+    ).one()
+    return (count, updated_at) if count else None
+
+def questions_query(topic=None, difficulty=None):
+    # Served by ix_questions_topic_difficulty; the unfiltered form walks it too,
+    # so the bank is warmed already grouped by (topic, difficulty)
+    query = select(Question)
+    if topic is not None:
+        query = query.where(Question.topic == topic)
+    if difficulty is not None:
+        query = query.where(Question.difficulty == difficulty)
+    return query.order_by(Question.topic, Question.difficulty, Question.id)
+
+def load_questions(db, topic=None, difficulty=None, batch_size=5000):
+    return [question_item(row) for row in db.execute(questions_query(topic, difficulty)).scalars().yield_per(batch_size)]
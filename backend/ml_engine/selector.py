@@ -0,0 +1,189 @@
+import bisect
+import random
+import threading
+from collections import OrderedDict, deque
+
+from ml_engine.question_bank import question_bank
+
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+
+class AdaptiveSelector:
+    """
+    Mastery-aware question selection.
+
+    1. Pick a topic, weighted towards the learner's weakest topics
+       (with a small exploration rate so new topics still show up).
+    2. Map mastery + confidence to a difficulty tier and snap it to the
+       nearest tier that exists for that topic.
+    3. Sample from the precomputed (topic, difficulty) bucket, skipping
+       questions the learner has seen recently.
+
+    Every step works off the bank's indexes, so the cost per call depends on
+    how many topics the learner has touched, not on the size of the bank.
+    """
+
+    def __init__(self, bank, recent_window=20, explore_rate=0.15, max_users=10000, max_retries=4):
+        self.bank = bank
+        self.recent_window = recent_window
+        self.explore_rate = explore_rate
+        self.max_users = max_users
+        self.max_retries = max_retries
+
+        # user_id -> (deque of recent ids, set of the same ids), LRU-bounded
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+
+    # --- Recently seen tracking ---
+    def _recent_for(self, user_id):
+        with self._lock:
+            entry = self._recent.get(user_id)
+            if entry is None:
+                entry = (deque(), set())
+                self._recent[user_id] = entry
+                if len(self._recent) > self.max_users:
+                    self._recent.popitem(last=False)
+            else:
+                self._recent.move_to_end(user_id)
+            return entry
+
+    def mark_seen(self, user_id, question_id):
+        if user_id is None or question_id is None:
+            return
+        order, seen = self._recent_for(user_id)
+        with self._lock:
+            if question_id in seen:
+                return
+            order.append(question_id)
+            seen.add(question_id)
+            if len(order) > self.recent_window:
+                seen.discard(order.popleft())
+
+    # --- Policy ---
+    @staticmethod
+    def target_difficulty(mastery, confidence):
+        # Mastery dominates; confidence nudges the tier up or down
+        score = 0.7 * mastery + 0.3 * confidence
+        tier = MIN_DIFFICULTY + round(score * (MAX_DIFFICULTY - MIN_DIFFICULTY))
+        return max(MIN_DIFFICULTY, min(MAX_DIFFICULTY, tier))
+
+    def pick_topic(self, topic_mastery):
+        by_topic = self.bank.by_topic
+        known = [(t, m) for t, m in topic_mastery.items() if t in by_topic]
+
+        if not known or random.random() < self.explore_rate:
+            topics = self.bank.topic_list
+            return random.choice(topics) if topics else None
+
+        # Weakest topics get the largest weight; squared to sharpen the focus
+        weights = [(1.05 - m) ** 2 for _, m in known]
+        return random.choices(known, weights=weights, k=1)[0][0]
+
+    def nearest_difficulty(self, topic, target):
+        tiers = self.bank.difficulties_by_topic.get(topic)
+        if not tiers:
+            return None
+        i = bisect.bisect_left(tiers, target)
+        if i == 0:
+            return tiers[0]
+        if i == len(tiers):
+            return tiers[-1]
+        before, after = tiers[i - 1], tiers[i]
+        return before if target - before <= after - target else after
+
+    def _sample_bucket(self, bucket, seen, exclude=()):
+        candidate = None
+        for _ in range(self.max_retries):
+            candidate = bucket[random.randrange(len(bucket))]
+            if candidate.get("id") not in seen and candidate.get("id") not in exclude:
+                return candidate
+        # Tiny bucket or very recent history: repeating beats failing
+        return candidate
+
+    def select(self, learner_state, user_id=None, exclude=()):
+        """exclude: ids to avoid on top of the recent history (e.g. already in a planned session)."""
+        self.bank.refresh()
+        topic_mastery = learner_state.get("topic_mastery") or {}
+        confidence = learner_state.get("confidence_avg", 0.5)
+        if confidence is None:
+            confidence = 0.5
+
+        topic = self.pick_topic(topic_mastery)
+        if topic is None:
+            return self.bank.random_question()
+
+        mastery = topic_mastery.get(topic, 0.5)
+        difficulty = self.nearest_difficulty(topic, self.target_difficulty(mastery, confidence))
+        bucket = self.bank.by_topic_difficulty.get((topic, difficulty))
+        if not bucket:
+            return self.bank.random_question()
+
+        seen = self._recent_for(user_id)[1] if user_id is not None else ()
+        question = self._sample_bucket(bucket, seen, exclude)
+        self.mark_seen(user_id, question.get("id"))
+        return question
+
+    def _unplanned(self, topic, target, planned):
+        """Questions of `topic` not in `planned`, nearest tier to `target` first, random order within a tier."""
+        tiers = self.bank.difficulties_by_topic.get(topic) or ()
+        for difficulty in sorted(tiers, key=lambda d: (abs(d - target), d)):
+            bucket = self.bank.by_topic_difficulty[(topic, difficulty)]
+            offset = random.randrange(len(bucket))
+            for i in range(len(bucket)):
+                question = bucket[(offset + i) % len(bucket)]
+                if question.get("id") not in planned:
+                    yield question
+
+    @staticmethod
+    def _first_fresh(candidates, seen):
+        """First candidate not seen recently, else the first one at all (None if there are none)."""
+        fallback = None
+        for question in candidates:
+            if question.get("id") not in seen:
+                return question
+            if fallback is None:
+                fallback = question
+        return fallback
+
+    def select_many(self, learner_state, n, user_id=None):
+        """
+        n distinct questions, each slot drawn like select(): topic by weakness,
+        then the tier nearest the target. When that topic has nothing left that
+        isn't already planned, the slot falls back to the topic's neighbouring
+        tiers, then to the other topics (weakest first). Returns fewer than n
+        only when the bank has fewer servable questions than that.
+        Recently seen questions are skipped while anything else remains.
+        """
+        self.bank.refresh()
+        topic_mastery = learner_state.get("topic_mastery") or {}
+        confidence = learner_state.get("confidence_avg", 0.5)
+        if confidence is None:
+            confidence = 0.5
+        seen = self._recent_for(user_id)[1] if user_id is not None else ()
+        n = min(n, len(self.bank.servable))
+
+        planned = []
+        ids = set()
+        while len(planned) < n:
+            topic = self.pick_topic(topic_mastery)
+            if topic is None:
+                break
+            target = self.target_difficulty(topic_mastery.get(topic, 0.5), confidence)
+            question = self._first_fresh(self._unplanned(topic, target, ids), seen)
+            if question is None:
+                # Topic used up for this session: take from the rest, weakest first
+                others = sorted(self.bank.topic_list, key=lambda t: topic_mastery.get(t, 0.5))
+                question = self._first_fresh(
+                    (q for t in others
+                     for q in self._unplanned(t, self.target_difficulty(topic_mastery.get(t, 0.5), confidence), ids)),
+                    seen
+                )
+            if question is None:
+                break
+            ids.add(question.get("id"))
+            planned.append(question)
+            self.mark_seen(user_id, question.get("id"))
+        return planned
+
+# Singleton instance
+selector = AdaptiveSelector(question_bank)
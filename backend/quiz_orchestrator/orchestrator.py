@@ -1,35 +1,195 @@
-from context_engine.learner_state import update_context
-from ml_engine.knowledge_model import decide_next_step
-from rag_service.rag_pipeline import generate_explanation
+import asyncio
+import os
 
-def handle_answer(payload):
-    # payload: { "user_id": str, "question_id": str, "answer": str, "time_taken": int, "confidence": float }
-    
-    # 1. Check Correctness (Simple string match for prototype)
-    # Ideally, we fetch the question from DB to verify, but we trust the payload or the frontend's claim for now?
-    # Actually, let's fetch the question logic if possible, or just define it.
-    # For this prototype, we'll assume the client sends the *correct* answer too? No that's insecure.
-    # We should look up the question. But context_engine text lookup is mocked.
-    # Let's trust the input "answer" vs "correct" if we had it, but we don't.
-    # WE WILL TRUST THE FRONTEND confidence/time for now, or just assume "success" if the user moves on?
-    # NO, we need to know.
-    # Let's mock "is_correct" as True if confidence > 0.6 for the sake of the 'Happy Path' demo scene if we lack real validation here.
-    # FAILSAFE: The frontend knows it's correct. Let's ask frontend to send 'is_correct' flag in payload.
-    
-    # 1. Update Learner State
-    learner_state = update_context(payload)
+from context_engine.learner_state import (
+    update_context, update_context_async, update_context_batch_async, get_learner_state, get_learner_state_async
+)
+from context_engine.mistake_log import mistake_writer
+from ml_engine.knowledge_model import decide_next_step, plan_session
+from rag_service.rag_pipeline import generate_explanation, generate_explanation_async
+from ml_engine.question_bank import question_bank, public_question
+from rag_service.cache import LRUCache
+
+# (user_id, question_id) -> the server-side payload of that learner's last graded
+# answer; /quiz/explain/stream only explains what is in here, since its prompt
+# and context carry the correct answer
+GRADED_CACHE_SIZE = int(os.getenv("GRADED_CACHE_SIZE", "10000"))
+GRADED_CACHE_TTL = float(os.getenv("GRADED_CACHE_TTL", "3600"))
+graded_answers = LRUCache(GRADED_CACHE_SIZE, ttl=GRADED_CACHE_TTL, name="graded_answers")
+EXPLAIN_FIELDS = ("question_id", "question_text", "answer", "topic", "error_type")
+
+def grade_answer(payload):
+    """
+    Grades payload["answer"] in O(1) from the in-memory answer key.
+    Returns (payload with is_correct/topic set by the server, result for the client);
+    result is None for ids outside the bank (e.g. the welcome card or a skip).
+    """
+    payload = dict(payload)
+    question_id = payload.get("question_id")
+    is_correct = question_bank.grade(question_id, payload.get("answer"))
+    payload["is_correct"] = bool(is_correct)
+    if is_correct is None:
+        return payload, None
+
+    question = question_bank.by_id.get(question_id, {})
+    payload["topic"] = question.get("topic", "General")
+    # Prompts are built from the bank's copy, never from text or labels the client sent
+    payload["question_text"] = question.get("question")
+    payload["error_type"] = question.get("error_type") or "conceptual"
+    result = {
+        "question_id": question_id,
+        "is_correct": is_correct,
+        # Revealed only once the learner has committed to an answer
+        "correct": question.get("correct")
+    }
+    if not is_correct and question.get("misconception"):
+        result["misconception"] = question["misconception"]
+    return payload, result
+
+def remember_graded(payload):
+    graded_answers.put((payload["user_id"], payload["question_id"]),
+                       {field: payload.get(field) for field in EXPLAIN_FIELDS})
+
+def graded_payload(user_id, question_id):
+    """Payload to explain `question_id` for this learner, or None if they haven't been graded on it."""
+    return graded_answers.get((user_id, question_id))
+
+def mastery_update(learner_state, full=False):
+    """
+    Mastery as a delta against what the client already has: just the topics the
+    answer(s) moved, or the whole map when full (a start/skip: nothing graded, client may be fresh).
+    """
+    mastery = learner_state.get("topic_mastery") or {}
+    if full:
+        return {topic: round(value, 4) for topic, value in mastery.items()}, {}
+    deltas = learner_state.get("mastery_delta") or {}
+    return ({topic: round(mastery[topic], 4) for topic in deltas if topic in mastery},
+            {topic: round(delta, 4) for topic, delta in deltas.items()})
+
+def answer_response(result, decision, explanation, learner_state):
+    """
+    Lean /quiz/next body: the grade, the next question (client fields only),
+    an optional explanation and mastery deltas. The full learner state no
+    longer rides along; it grows with every topic the learner has seen.
+    """
+    mastery, mastery_delta = mastery_update(learner_state, full=result is None)
+    return {
+        "result": result,
+        "next_question": public_question(decision.get("question")),
+        "explanation": explanation,
+        "mastery": mastery,
+        "mastery_delta": mastery_delta,
+        "confidence_avg": round(learner_state.get("confidence_avg", 0.5), 4)
+    }
+
+def handle_answer(payload, user_id):
+    # payload: { "question_id": str, "answer": str, "time_taken": int, "confidence": float }
+    # user_id comes from the verified token; any user_id in the body is overwritten
+
+    # 0. Grade against the server-side answer key (the client's claim is ignored)
+    payload, result = grade_answer(payload)
+    payload["user_id"] = user_id
+    if result is not None:
+        remember_graded(payload)
+
+    # 1. Update Learner State (ungraded starts/skips are no evidence about mastery)
+    learner_state = update_context(payload) if result is not None else get_learner_state(user_id)
     
     # 2. Decide Next Step (ML Engine)
-    decision = decide_next_step(learner_state)
+    decision = decide_next_step(learner_state, user_id=user_id)
 
     explanation = None
     # 3. If needed, call RAG for explanation
     if decision.get("need_explanation"):
         explanation = generate_explanation(payload, learner_state)
 
-    # 4. Return next question and optional explanation
+    # 4. Return the grade, next question (without its answer) and optional explanation
+    return answer_response(result, decision, explanation, learner_state)
+
+async def handle_answer_async(payload, user_id):
+    """
+    Same flow as handle_answer without blocking the event loop:
+    async DB write, in-memory selection, RAG on the bounded executor.
+    """
+    # 0. Grade against the server-side answer key (in-memory, O(1))
+    payload, result = grade_answer(payload)
+    payload["user_id"] = user_id
+    if result is not None:
+        remember_graded(payload)
+
+    # 1. Update Learner State (aiosqlite); ungraded starts/skips are no evidence about mastery
+    if result is not None:
+        learner_state = await update_context_async(payload)
+    else:
+        learner_state = await get_learner_state_async(user_id)
+
+    # 2. Decide Next Step (in-memory, microseconds)
+    decision = decide_next_step(learner_state, user_id=user_id)
+
+    explanation = None
+    # 3. If needed, call RAG for explanation (offloaded, may be skipped under load)
+    if decision.get("need_explanation"):
+        explanation = await generate_explanation_async(payload, learner_state)
+
+    # 4. Return the grade, next question (without its answer) and optional explanation
+    return answer_response(result, decision, explanation, learner_state)
+
+async def plan_session_async(user_id, length):
+    """
+    Prefetch for /quiz/session: `length` planned questions (client fields only)
+    from the learner's current mastery, plus that mastery in full so the client starts in sync.
+    """
+    learner_state = await get_learner_state_async(user_id)
+    questions = plan_session(learner_state, length, user_id=user_id)
+    mastery, _ = mastery_update(learner_state, full=True)
     return {
-        "next_question": decision.get("question"),
-        "explanation": explanation,
-        "learner_state": learner_state # return for debugging/UI
+        "questions": [public_question(q) for q in questions],
+        "mastery": mastery,
+        "confidence_avg": round(learner_state.get("confidence_avg", 0.5), 4)
+    }
+
+async def log_mistakes(user_id, graded):
+    # Wrong answers go straight to the mistake notebook, saving the client a call per mistake
+    for payload, result in graded:
+        if result["is_correct"]:
+            continue
+        try:
+            await mistake_writer.log(
+                user_id, result["question_id"], payload.get("topic", "General"),
+                payload.get("question_text") or "", str(payload.get("answer", "")), result.get("correct") or ""
+            )
+        except asyncio.TimeoutError:
+            print(f"Mistake log busy, dropped mistake for user {user_id} on {result['question_id']}")
+
+async def handle_answers_async(answers, user_id, prefetch=0):
+    """
+    Batched /quiz/answers: grades every answer in memory, applies the graded
+    ones to the learner state in one update, logs the mistakes, and optionally
+    plans the next `prefetch` questions in the same round trip. No explanations
+    here; the client streams one from /quiz/explain/stream when it wants it.
+    """
+    results = []
+    graded = []
+    for answer in answers:
+        payload, result = grade_answer(answer)
+        payload["user_id"] = user_id
+        results.append(result)
+        if result is not None:
+            remember_graded(payload)
+            graded.append((payload, result))
+
+    if graded:
+        learner_state = await update_context_batch_async(user_id, [payload for payload, _ in graded])
+        await log_mistakes(user_id, graded)
+    else:
+        learner_state = await get_learner_state_async(user_id)
+
+    questions = plan_session(learner_state, prefetch, user_id=user_id) if prefetch else []
+    mastery, mastery_delta = mastery_update(learner_state, full=not graded)
+    return {
+        "results": results,
+        "questions": [public_question(q) for q in questions],
+        "mastery": mastery,
+        "mastery_delta": mastery_delta,
+        "confidence_avg": round(learner_state.get("confidence_avg", 0.5), 4)
     }
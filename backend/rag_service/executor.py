@@ -0,0 +1,80 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+class ExecutorOverloaded(RuntimeError):
+    pass
+
+class BoundedExecutor:
+    """
+    Dedicated thread pool for CPU-heavy work (embedding, FAISS search) called
+    from async handlers.
+
+    At most max_workers jobs run and at most max_pending more wait; past that,
+    run() fails fast with ExecutorOverloaded instead of queueing without bound,
+    so callers can degrade (e.g. skip the explanation) rather than pile up.
+
+    processes=True runs jobs on a process pool instead, for pure-Python CPU
+    work that would hold the GIL (fn and its arguments must be picklable).
+    Its workers are started by forkserver (spawn where that's unavailable),
+    never forked from the server process, whose other threads may hold locks.
+    """
+
+    def __init__(self, max_workers=4, max_pending=32, name="bounded", processes=False):
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_pending
+        self.name = name
+        if processes:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.capacity)
+
+        self.rejected = 0
+        self.completed = 0
+        self.peak_in_flight = 0
+
+    @property
+    def in_flight(self):
+        return self.capacity - self._slots._value
+
+    @property
+    def queued(self):
+        # Jobs accepted but still waiting for a worker
+        return max(0, self.in_flight - self.max_workers)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "workers": self.max_workers,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "peak_in_flight": self.peak_in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+    def _release(self, _future):
+        self.completed += 1
+        self._slots.release()
+
+    async def run(self, fn, *args, timeout=None):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise ExecutorOverloaded(f"{self.in_flight} jobs in flight (capacity {self.capacity})")
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the job really finishes, even if the caller times out
+        future.add_done_callback(self._release)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+class IndexCache:
+    """
+    On-disk cache for the vector store.
+
+    - embeddings.npy: one (key, vector) record per document, keyed by a hash
+      of (model name, document text), loaded memory-mapped so unchanged rows
+      are reused without re-encoding. Keys and vectors share the file, so one
+      rename replaces both.
+    - index-<version>/ with index.faiss + manifest.json: the built FAISS index,
+      the ordered keys and index build params it came from. index.current names
+      the live version; replacing it is the one rename that publishes a new
+      index and manifest together. If both still match, the index is read back as-is.
+    """
+
+    def __init__(self, cache_dir, model_name):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.embeddings_path = os.path.join(cache_dir, "embeddings.npy")
+        self.current_path = os.path.join(cache_dir, "index.current")
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_name}\n{text}".encode('utf-8')).hexdigest()[:32]
+
+    # --- Helpers ---
+    def _tmp(self, path):
+        # Per-process temp names so several workers can rebuild concurrently
+        return f"{path}.{os.getpid()}.tmp"
+
+    def _write_json(self, path, data):
+        tmp = self._tmp(path)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _read_json(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_text(self, path, text):
+        tmp = self._tmp(path)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    # --- Embeddings ---
+    @staticmethod
+    def _record_dtype(dimension):
+        # Keys are fixed-width hex (see key()), so they fit alongside each vector
+        return np.dtype([("key", "S32"), ("vector", "<f4", (dimension,))])
+
+    def load_embeddings(self):
+        """Returns (keys, memory-mapped matrix) or ([], None) when there is no cache."""
+        try:
+            records = np.load(self.embeddings_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return [], None
+        # Anything else (e.g. a bare matrix from before keys lived in the file) is a miss
+        if records.dtype.names != ("key", "vector") or records.ndim != 1:
+            return [], None
+        return [k.decode('ascii') for k in records["key"]], records["vector"]
+
+    def save_embeddings(self, keys, matrix):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        matrix = np.asarray(matrix, dtype='float32')
+        records = np.empty(len(keys), dtype=self._record_dtype(matrix.shape[1]))
+        records["key"] = keys
+        records["vector"] = matrix
+        tmp = self._tmp(self.embeddings_path)
+        with open(tmp, 'wb') as f:
+            np.save(f, records)
+        os.replace(tmp, self.embeddings_path)
+
+    def embed(self, texts, keys, encode, dimension):
+        """
+        Returns a float32 matrix for texts, encoding only the ones whose
+        (model, text) hash is not already cached, and refreshes the cache.
+        """
+        cached_keys, cached = self.load_embeddings()
+        if cached is not None and cached.shape[1] != dimension:
+            cached_keys, cached = [], None
+        row_of = {k: i for i, k in enumerate(cached_keys)}
+
+        matrix = np.empty((len(texts), dimension), dtype='float32')
+        missing = []
+        for i, k in enumerate(keys):
+            row = row_of.get(k)
+            if row is None:
+                missing.append(i)
+            else:
+                matrix[i] = cached[row]
+
+        if missing:
+            print(f"Embedding {len(missing)} new or changed documents ({len(texts) - len(missing)} cached)...")
+            fresh = encode([texts[i] for i in missing])
+            matrix[missing] = np.asarray(fresh, dtype='float32')
+        else:
+            print(f"All {len(texts)} document embeddings served from cache.")
+
+        if missing or cached_keys != keys:
+            # Drop the memory map before overwriting the file it points at
+            del cached
+            self.save_embeddings(keys, matrix)
+        return matrix
+
+    # --- Index ---
+    def _current_index_dir(self):
+        try:
+            with open(self.current_path, 'r', encoding='utf-8') as f:
+                version = f.read().strip()
+        except OSError:
+            return None
+        return os.path.join(self.cache_dir, version) if version else None
+
+    def load_index(self, keys, params=None):
+        """Returns the cached FAISS index if it was built from exactly these keys and params, else None."""
+        import faiss
+
+        directory = self._current_index_dir()
+        if directory is None:
+            return None
+        try:
+            manifest = self._read_json(os.path.join(directory, "manifest.json"))
+        except (OSError, ValueError):
+            return None
+        if manifest.get("model") != self.model_name or manifest.get("params") != params or manifest.get("keys") != keys:
+            return None
+
+        index_path = os.path.join(directory, "index.faiss")
+        try:
+            return faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except Exception:
+            # Not every index type supports mmap; fall back to a regular read
+            try:
+                return faiss.read_index(index_path)
+            except Exception as e:
+                print(f"Failed to read cached index: {e}")
+                return None
+
+    def save_index(self, index, keys, params=None):
+        import faiss
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        version = f"index-{time.time_ns()}-{os.getpid()}"
+        directory = os.path.join(self.cache_dir, version)
+        # Built under a .tmp name so pruning by a concurrent writer never touches it
+        staging = f"{directory}.tmp"
+        os.makedirs(staging)
+        faiss.write_index(index, os.path.join(staging, "index.faiss"))
+        with open(os.path.join(staging, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump({"model": self.model_name, "params": params, "keys": keys}, f)
+        os.replace(staging, directory)
+
+        previous = self._current_index_dir()
+        self._write_text(self.current_path, version)
+        self._prune_index_versions(keep={directory, previous})
+
+    def _prune_index_versions(self, keep):
+        # The version just replaced is kept too: a reader may still be opening it
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith("index-") and not name.endswith(".tmp") and path not in keep:
+                shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,107 @@
+import math
+import os
+
+import numpy as np
+
+INDEX_KINDS = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# FAISS warns below ~39 training points per centroid; PQ codebooks need 256 per sub-quantizer
+MIN_POINTS_PER_CENTROID = 39
+PQ_CENTROIDS = 256
+
+class IndexSpec:
+    """
+    Describes which FAISS index to build and how to search it.
+
+    kind:       flat | ivf_flat | hnsw | ivf_pq
+    nlist:      IVF cells (default ~4*sqrt(N), bounded by the training set size)
+    nprobe:     IVF cells visited per query (recall vs latency)
+    m:          HNSW neighbours per node, or PQ sub-quantizers for ivf_pq
+    ef_search:  HNSW candidate list size per query (recall vs latency)
+    """
+
+    def __init__(self, kind="flat", nlist=None, nprobe=8, m=None, ef_construction=40, ef_search=64):
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind '{kind}'. Expected one of {INDEX_KINDS}")
+        self.kind = kind
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+
+    @classmethod
+    def from_env(cls):
+        def _int(name):
+            value = os.getenv(name)
+            return int(value) if value else None
+
+        spec = cls(kind=os.getenv("VECTOR_INDEX", "flat"))
+        spec.nlist = _int("VECTOR_NLIST")
+        spec.m = _int("VECTOR_M")
+        spec.nprobe = _int("VECTOR_NPROBE") or spec.nprobe
+        spec.ef_search = _int("VECTOR_EF_SEARCH") or spec.ef_search
+        return spec
+
+    def build_params(self):
+        """Parameters that change the stored index (part of the cache key)."""
+        return {"kind": self.kind, "nlist": self.nlist, "m": self.m, "ef_construction": self.ef_construction}
+
+    def __repr__(self):
+        return f"IndexSpec({self.kind}, nlist={self.nlist}, nprobe={self.nprobe}, m={self.m}, ef_search={self.ef_search})"
+
+def _default_nlist(n):
+    nlist = int(4 * math.sqrt(n))
+    return max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+
+def _default_pq_m(dimension):
+    # Largest sub-quantizer count <= dimension/8 that divides the dimension
+    for m in range(max(1, dimension // 8), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+def build_index(spec, dimension, embeddings):
+    """
+    Builds, trains and fills an index for embeddings (N x dimension, float32).
+    Falls back to a simpler index when there are too few vectors to train.
+    """
+    import faiss
+
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    n = embeddings.shape[0]
+    kind = spec.kind
+
+    if kind in ("ivf_flat", "ivf_pq") and n < MIN_POINTS_PER_CENTROID * 2:
+        print(f"Only {n} vectors; too few to train {kind}, using flat index.")
+        kind = "flat"
+    if kind == "ivf_pq" and n < PQ_CENTROIDS * MIN_POINTS_PER_CENTROID:
+        print(f"Only {n} vectors; too few to train PQ codebooks, using ivf_flat index.")
+        kind = "ivf_flat"
+
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, spec.m or 32)
+        index.hnsw.efConstruction = spec.ef_construction
+    else:
+        nlist = spec.nlist or _default_nlist(n)
+        quantizer = faiss.IndexFlatL2(dimension)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, spec.m or _default_pq_m(dimension), 8)
+        print(f"Training {kind} index (nlist={nlist}) on {n} vectors...")
+        index.train(embeddings)
+
+    index.add(embeddings)
+    tune_index(index, spec)
+    return index
+
+def tune_index(index, spec):
+    """Applies search-time knobs (nprobe / efSearch); safe to call on any index type."""
+    if spec.nprobe is not None and hasattr(index, "nprobe"):
+        index.nprobe = spec.nprobe
+    if spec.ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = spec.ef_search
+    return index
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import re
+
+def mock_completion(prompt):
+    # Mock LLM output (simulating "Creative Context"); deterministic for a given prompt
+    return f"**[AI GENERATED EXPLANATION]**\n\nBased on your answer and similar concepts in our knowledge graph:\n\n{prompt.split('Context')[1] if 'Context' in prompt else '...'}\n\nKey Insight: Review the difference between the provided options. The retrieved context suggests a specific pattern in this topic."
+
+class LLMBusy(RuntimeError):
+    pass
+
+class StubLLMClient:
+    """
+    Deterministic in-process backend: streams mock_completion word by word.
+    Used by default and in tests, so nothing needs network access.
+    """
+
+    def __init__(self, token_delay=0.0):
+        self.token_delay = token_delay
+
+    async def stream(self, prompt):
+        for token in re.findall(r"\S+\s*", mock_completion(prompt)):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield token
+
+    async def aclose(self):
+        pass
+
+class OpenAICompatibleClient:
+    """
+    Streams chat completions from any OpenAI-compatible server (OpenAI, vLLM,
+    llama.cpp, or scripts/llm_stub_server.py). One shared httpx pool per process.
+    """
+
+    def __init__(self, base_url=None, api_key=None, model="gpt-4o-mini", timeout=30.0, max_connections=20):
+        import httpx
+        from openai import AsyncOpenAI
+
+        self.model = model
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout, connect=5.0)
+        )
+        self._client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key or os.getenv("OPENAI_API_KEY", "not-needed"),
+            http_client=self._http,
+            max_retries=1
+        )
+
+    async def stream(self, prompt):
+        response = await self._client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def aclose(self):
+        await self._http.aclose()
+
+class LLMGateway:
+    """
+    Wraps a client with a process-wide concurrency cap and timeouts:
+    - queue_timeout: how long a request may wait for a free slot
+    - first_token_timeout / total_timeout: bounds on the model itself
+    """
+
+    def __init__(self, client, max_concurrency=8, queue_timeout=2.0, first_token_timeout=15.0, total_timeout=60.0):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.first_token_timeout = first_token_timeout
+        self.total_timeout = total_timeout
+        self._semaphore = None
+
+    def _slots(self):
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def stream(self, prompt):
+        slots = self._slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMBusy(f"All {self.max_concurrency} LLM slots busy")
+
+        tokens = self.client.stream(prompt).__aiter__()
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.total_timeout
+            first = True
+            while True:
+                limit = self.first_token_timeout if first else deadline - loop.time()
+                if limit <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    token = await asyncio.wait_for(tokens.__anext__(), limit)
+                except StopAsyncIteration:
+                    break
+                first = False
+                yield token
+        finally:
+            # Runs on completion, timeout, or when the HTTP client disconnects mid-stream
+            if hasattr(tokens, "aclose"):
+                await tokens.aclose()
+            slots.release()
+
+    async def complete(self, prompt):
+        return "".join([token async for token in self.stream(prompt)])
+
+def create_llm_gateway():
+    backend = os.getenv("LLM_BACKEND", "stub")
+    if backend == "openai":
+        client = OpenAICompatibleClient(
+            base_url=os.getenv("LLM_BASE_URL"),
+            model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
+            timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+        )
+    else:
+        client = StubLLMClient(token_delay=float(os.getenv("LLM_STUB_TOKEN_DELAY", "0")))
+
+    return LLMGateway(
+        client,
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "2")),
+        first_token_timeout=float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "15")),
+        total_timeout=float(os.getenv("LLM_TOTAL_TIMEOUT", "60"))
+    )
+
+# Singleton instance
+llm_gateway = create_llm_gateway()
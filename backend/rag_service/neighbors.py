@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from .vector_store import cache_dir
+
+class NeighborTable:
+    """
+    Precomputed top-k neighbours for every bank question.
+
+    neighbors.npy is an int32 (N x k) matrix of row numbers into
+    neighbors_ids.json (the question ids, in row order); -1 pads rows with
+    fewer than k neighbours. The matrix is memory-mapped, so a lookup by
+    question_id is a dict hit plus an array slice.
+
+    Build it offline with scripts/build_neighbors.py after the bank changes;
+    questions missing from the table fall back to live search.
+    """
+
+    def __init__(self, cache_dir, check_interval=30.0):
+        self.cache_dir = cache_dir
+        self.matrix_path = os.path.join(cache_dir, "neighbors.npy")
+        self.ids_path = os.path.join(cache_dir, "neighbors_ids.json")
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_check = None
+
+        self.ids = []
+        self.row_of = {}
+        self.matrix = None
+
+    # --- Loading ---
+    def refresh(self):
+        now = time.monotonic()
+        if self._last_check is not None and now - self._last_check < self.check_interval:
+            return
+
+        with self._lock:
+            if self._last_check is not None and now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+
+            try:
+                mtime = os.stat(self.matrix_path).st_mtime_ns
+            except OSError:
+                return
+            if mtime == self._mtime:
+                return
+
+            try:
+                with open(self.ids_path, 'r', encoding='utf-8') as f:
+                    ids = json.load(f)
+                matrix = np.load(self.matrix_path, mmap_mode='r')
+            except (OSError, ValueError) as e:
+                print(f"Failed to load neighbor table: {e}")
+                return
+            if matrix.shape[0] != len(ids):
+                print("Neighbor table is inconsistent with its id list; ignoring it.")
+                return
+
+            self.ids = ids
+            self.row_of = {qid: i for i, qid in enumerate(ids)}
+            self.matrix = matrix
+            self._mtime = mtime
+            print(f"Loaded neighbor table: {matrix.shape[0]} questions x {matrix.shape[1]} neighbors.")
+
+    def lookup(self, question_id, k):
+        """Returns up to k neighbour question ids, or None if the table can't answer."""
+        self.refresh()
+        row = self.row_of.get(question_id)
+        if row is None or self.matrix is None or k > self.matrix.shape[1]:
+            return None
+        ids = self.ids
+        return [ids[j] for j in self.matrix[row, :k] if j >= 0]
+
+    # --- Building ---
+    @staticmethod
+    def compute(index, embeddings, k, chunk_size=4096):
+        """Top-k neighbours of every row of embeddings in index, excluding the row itself."""
+        n = embeddings.shape[0]
+        # One extra result so dropping the query itself still leaves k
+        fetch = min(k + 1, n)
+        table = np.full((n, k), -1, dtype='int32')
+
+        for start in range(0, n, chunk_size):
+            chunk = np.ascontiguousarray(embeddings[start:start + chunk_size], dtype='float32')
+            _, found = index.search(chunk, fetch)
+            for offset, row in enumerate(found):
+                own = start + offset
+                neighbors = [j for j in row if j >= 0 and j != own][:k]
+                table[own, :len(neighbors)] = neighbors
+        return table
+
+    def save(self, ids, table):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_ids = f"{self.ids_path}.{os.getpid()}.tmp"
+        with open(tmp_ids, 'w', encoding='utf-8') as f:
+            json.dump(ids, f)
+        tmp_matrix = f"{self.matrix_path}.{os.getpid()}.tmp"
+        with open(tmp_matrix, 'wb') as f:
+            np.save(f, np.ascontiguousarray(table, dtype='int32'))
+        # Ids first: a reader only reloads when the matrix mtime changes
+        os.replace(tmp_ids, self.ids_path)
+        os.replace(tmp_matrix, self.matrix_path)
+
+# Singleton instance, stored next to the persisted index
+neighbor_table = NeighborTable(cache_dir)
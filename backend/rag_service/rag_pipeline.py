@@ -1,17 +1,73 @@
+import asyncio
+import os
+
+from ml_engine.question_bank import question_bank
+from .cache import LRUCache, normalize_text
+from .executor import BoundedExecutor, ExecutorOverloaded
+from .llm_client import llm_gateway, mock_completion
+from .neighbors import neighbor_table
 from .prompts import EXPLANATION_PROMPT
 from .vector_store import vector_store
 
-def retrieve_relevant_chunks(question_text):
-    # Real semantic search
-    results = vector_store.search(question_text, k=2)
+# Popular questions dominate explanation traffic, so cache retrieval by (normalized text, k)
+RAG_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "2048"))
+RAG_CACHE_TTL = float(os.getenv("RAG_CACHE_TTL", "0")) or None # seconds; unset = no expiry
+
+# Embedding + search for async handlers runs here, never on the event loop
+rag_executor = BoundedExecutor(
+    max_workers=int(os.getenv("RAG_WORKERS", "4")),
+    max_pending=int(os.getenv("RAG_MAX_PENDING", "32")),
+    name="rag"
+)
+RAG_TIMEOUT = float(os.getenv("RAG_TIMEOUT", "10"))
+
+search_cache = LRUCache(RAG_CACHE_SIZE, ttl=RAG_CACHE_TTL, name="search_results")
+context_cache = LRUCache(RAG_CACHE_SIZE, ttl=RAG_CACHE_TTL, name="context")
+
+def lookup_neighbors(question_id, k=2):
+    # Known bank question: its neighbours were precomputed offline, no embedding needed
+    ids = neighbor_table.lookup(question_id, k)
+    if ids is None:
+        return None
+    documents = [question_bank.get(qid) for qid in ids]
+    return [doc for doc in documents if doc is not None]
+
+def retrieve_documents(question_text, k=2, question_id=None):
+    if question_id is not None:
+        results = lookup_neighbors(question_id, k=k)
+        if results:
+            return results
+
+    key = (normalize_text(question_text), k)
+    results = search_cache.get(key)
+    if results is None:
+        # Real semantic search
+        results = vector_store.search(question_text, k=k)
+        # Empty results usually mean the index isn't ready yet; don't pin them
+        if results:
+            search_cache.put(key, results)
+    return results
+
+def retrieve_relevant_chunks(question_text, k=2, question_id=None):
+    key = (normalize_text(question_text), k)
+    context_str = context_cache.get(key)
+    if context_str is not None:
+        return context_str
+
+    results = retrieve_documents(question_text, k=k, question_id=question_id)
     
     # Format results for the LLM context window
     context_str = ""
     for i, item in enumerate(results):
         context_str += f"Context {i+1}: [Topic: {item['topic']}] Q: {item['question']} -> Correct Answer: {item['correct']}. Misconception: {item.get('misconception', 'None')}\n"
     
+    if results:
+        context_cache.put(key, context_str)
     return context_str
 
+def cache_stats():
+    return [vector_store.query_cache.stats(), search_cache.stats(), context_cache.stats()]
+
 def build_prompt(payload, learner_state, context):
     question = payload.get("question_text", "Unknown Question")
     answer = payload.get("answer", "Unknown Answer")
@@ -25,18 +81,15 @@ def build_prompt(payload, learner_state, context):
     )
 
 def call_llm(prompt):
-    # Mock LLM call (simulating "Creative Context")
-    # In a real deployment, we'd use:
-    # client = OpenAI(api_key=...)
-    # response = client.chat.completions.create(model="gpt-4", messages=[...])
-    
-    return f"**[AI GENERATED EXPLANATION]**\n\nBased on your answer and similar concepts in our knowledge graph:\n\n{prompt.split('Context')[1] if 'Context' in prompt else '...'}\n\nKey Insight: Review the difference between the provided options. The retrieved context suggests a specific pattern in this topic."
+    # Sync path keeps the deterministic mock; real models are served through
+    # llm_gateway (see stream_explanation / LLM_BACKEND in llm_client.py)
+    return mock_completion(prompt)
 
 def generate_explanation(payload, learner_state):
     question_text = payload.get("question_text", "Example Question")
     
-    # 1. Retrieve real context from FAISS
-    context = retrieve_relevant_chunks(question_text)
+    # 1. Retrieve context: precomputed neighbours for bank questions, live FAISS search otherwise
+    context = retrieve_relevant_chunks(question_text, question_id=payload.get("question_id"))
     
     # 2. Build prompt
     prompt = build_prompt(payload, learner_state, context)
@@ -45,3 +98,36 @@ def generate_explanation(payload, learner_state):
     explanation = call_llm(prompt)
     
     return explanation
+
+async def generate_explanation_async(payload, learner_state):
+    """
+    Runs generate_explanation on the bounded RAG executor.
+    Returns None when the executor is saturated or too slow, so the quiz
+    flow keeps moving (the frontend falls back to the stored misconception).
+    """
+    try:
+        return await rag_executor.run(generate_explanation, payload, learner_state, timeout=RAG_TIMEOUT)
+    except ExecutorOverloaded as e:
+        print(f"Skipping explanation, RAG executor overloaded: {e}")
+    except asyncio.TimeoutError:
+        print(f"Skipping explanation, RAG took longer than {RAG_TIMEOUT}s")
+    return None
+
+async def stream_explanation(payload, learner_state=None):
+    """
+    Async generator of explanation tokens. Retrieval runs on the RAG executor,
+    then tokens are relayed from the LLM as soon as they arrive.
+    """
+    question_text = payload.get("question_text", "Example Question")
+
+    # 1. Retrieve context (off the event loop)
+    context = await rag_executor.run(
+        retrieve_relevant_chunks, question_text, 2, payload.get("question_id"), timeout=RAG_TIMEOUT
+    )
+
+    # 2. Build prompt
+    prompt = build_prompt(payload, learner_state, context)
+
+    # 3. Stream
+    async for token in llm_gateway.stream(prompt):
+        yield token
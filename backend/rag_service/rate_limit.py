@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """
+    Async token bucket: refills at `rate` tokens per second up to `burst`.
+    acquire() waits until a token is available, so N concurrent callers are
+    smoothed to the target request rate instead of bursting into a provider's
+    rate limit.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1.0):
+        # Created lazily so it binds to the running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # The lock keeps waiters FIFO: whoever is first gets the next token
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    def penalize(self, seconds):
+        """Drains the bucket for `seconds`, e.g. after a 429 with Retry-After."""
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
@@ -1,57 +1,193 @@
-import faiss
 import numpy as np
-import json
 import os
-from sentence_transformers import SentenceTransformer
+import threading
+
+from .batcher import MicroBatcher
+from .cache import LRUCache, normalize_text
+from .index_cache import IndexCache
+from .index_factory import IndexSpec, build_index, tune_index
+from ml_engine.question_bank import question_bank
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+def document_text(item):
+    # Create a rich representation of the concept
+    return f"Question: {item['question']} Answer: {item['correct']} Topic: {item['topic']} Misconception: {item.get('misconception', '')}"
 
 class FaissVectorStore:
-    def __init__(self, dataset_path=None):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    """
+    Semantic search over the question bank.
+
+    Loading the SentenceTransformer model and embedding the bank is slow, so it
+    never happens at import time. Call start() to build the index on a
+    background thread; search() waits for it only when it is actually needed.
+    """
+
+    def __init__(self, bank=None, model_name=MODEL_NAME, cache_dir=None, index_spec=None,
+                 batch_size=32, batch_wait_ms=5, query_cache_size=4096, query_cache_ttl=None):
+        # QuestionBank whose questions are indexed; None starts with an empty index
+        self.bank = bank
+        self.model_name = model_name
+        self.index_spec = index_spec or IndexSpec()
+        # Persisted index + embeddings; None disables the on-disk cache
+        self.cache = IndexCache(cache_dir, model_name) if cache_dir else None
+        self.model = None
         self.dimension = 384
-        self.index = faiss.IndexFlatL2(self.dimension)
+        self.index = None
         self.documents = []
-        
-        if dataset_path:
-            self.load_and_index(dataset_path)
 
-    def load_and_index(self, dataset_path):
-        print(f"Loading knowledge base from {dataset_path}...")
+        # Readiness state: not_started -> loading -> ready | failed
+        self.status = "not_started"
+        self.error = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # Concurrent search() calls share one encode + one index.search; batch_size=1 disables it
+        self.batcher = None
+        if batch_size > 1:
+            self.batcher = MicroBatcher(self._search_items, max_batch=batch_size,
+                                        max_wait_ms=batch_wait_ms, name="vector-search-batcher")
+
+        # Query embeddings keyed by normalized text; popular questions skip the model entirely
+        self.query_cache = LRUCache(query_cache_size, ttl=query_cache_ttl, name="query_embeddings")
+
+    # --- Lifecycle ---
+    def start(self):
+        """Kicks off background initialization (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.status = "loading"
+            self._thread = threading.Thread(target=self._initialize, name="vector-store-init", daemon=True)
+            self._thread.start()
+
+    def _initialize(self):
+        try:
+            # Heavy imports live here so importing this module stays cheap
+            import faiss
+            from sentence_transformers import SentenceTransformer
+
+            self.model = SentenceTransformer(self.model_name)
+            self.index = faiss.IndexFlatL2(self.dimension)
+            if self.bank is not None:
+                self.load_and_index(self.bank.all())
+            self.status = "ready"
+        except Exception as e:
+            print(f"Failed to initialize vector store: {e}")
+            self.error = str(e)
+            self.status = "failed"
+        finally:
+            self._ready.set()
+
+    @property
+    def is_ready(self):
+        return self.status == "ready"
+
+    def wait_until_ready(self, timeout=None):
+        """Starts initialization if needed and blocks until it finishes. Returns readiness."""
+        self.start()
+        self._ready.wait(timeout)
+        return self.is_ready
+
+    # --- Indexing ---
+    def load_and_index(self, data):
+        print(f"Indexing knowledge base ({len(data)} questions)...")
         try:
-            with open(dataset_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
             # Prepare documents
             texts = []
             for item in data:
-                # Create a rich representation of the concept
-                content = f"Question: {item['question']} Answer: {item['correct']} Topic: {item['topic']} Misconception: {item.get('misconception', '')}"
-                texts.append(content)
+                texts.append(document_text(item))
                 self.documents.append(item) # Store full metadata
-            
-            # Embed
-            print("Embedding documents (this may take a moment)...")
-            embeddings = self.model.encode(texts)
-            
-            # Index
-            self.index.add(np.array(embeddings, dtype='float32'))
-            print(f"Indexed {self.index.ntotal} documents.")
-            
+
+            if self.cache is None:
+                print("Embedding documents (this may take a moment)...")
+                embeddings = self.model.encode(texts)
+                self.index = build_index(self.index_spec, self.dimension, embeddings)
+                print(f"Indexed {self.index.ntotal} documents ({self.index_spec.kind}).")
+                return
+
+            # Reuse the persisted index when the bank, model and index build params are unchanged
+            keys = [self.cache.key(t) for t in texts]
+            index = self.cache.load_index(keys, self.index_spec.build_params())
+            if index is not None:
+                self.index = tune_index(index, self.index_spec)
+                print(f"Loaded cached index with {self.index.ntotal} documents.")
+                return
+
+            # Otherwise only new or edited documents go through the model
+            embeddings = self.cache.embed(texts, keys, self.model.encode, self.dimension)
+            index = build_index(self.index_spec, self.dimension, embeddings)
+            self.cache.save_index(index, keys, self.index_spec.build_params())
+            self.index = index
+            print(f"Indexed {self.index.ntotal} documents ({self.index_spec.kind}).")
+
         except Exception as e:
             print(f"Failed to load vector store: {e}")
 
-    def search(self, query, k=3):
-        query_vector = self.model.encode([query])
-        distances, indices = self.index.search(np.array(query_vector, dtype='float32'), k)
-        
-        results = []
-        for idx in indices[0]:
-            if idx < len(self.documents):
-                results.append(self.documents[idx])
-        return results
+    def document_embeddings(self):
+        """Embedding matrix for self.documents, served from the on-disk cache when possible."""
+        self.wait_until_ready()
+        texts = [document_text(item) for item in self.documents]
+        if self.cache is None:
+            return np.asarray(self.model.encode(texts), dtype='float32')
+        keys = [self.cache.key(t) for t in texts]
+        return self.cache.embed(texts, keys, self.model.encode, self.dimension)
+
+    # --- Search ---
+    def search_batch(self, queries, k=3):
+        """Encodes all queries in one forward pass and runs a single index search."""
+        if not queries or not self.wait_until_ready():
+            return [[] for _ in queries]
+
+        query_vectors = self._encode_queries(queries)
+        distances, indices = self.index.search(query_vectors, k)
+
+        all_results = []
+        for row in indices:
+            results = []
+            for idx in row:
+                if 0 <= idx < len(self.documents):
+                    results.append(self.documents[idx])
+            all_results.append(results)
+        return all_results
+
+    def _encode_queries(self, queries):
+        keys = [normalize_text(q) for q in queries]
+        vectors = [self.query_cache.get(key) for key in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+
+        if missing:
+            encoded = np.asarray(self.model.encode([queries[i] for i in missing]), dtype='float32')
+            for row, i in enumerate(missing):
+                vectors[i] = encoded[row]
+                self.query_cache.put(keys[i], encoded[row])
+
+        return np.ascontiguousarray(np.vstack(vectors), dtype='float32')
+
+    def _search_items(self, items):
+        # Batches may mix k values: search once with the largest and trim per caller
+        max_k = max(k for _, k in items)
+        results = self.search_batch([query for query, _ in items], k=max_k)
+        return [r[:k] for r, (_, k) in zip(results, items)]
+
+    def search(self, query, k=3, timeout=None):
+        if not self.wait_until_ready(timeout):
+            return []
+        if self.batcher is None:
+            return self.search_batch([query], k=k)[0]
+        return self.batcher((query, k), timeout=timeout)
 
 # Singleton instance
 current_dir = os.path.dirname(os.path.abspath(__file__))
-dataset_path = os.path.join(current_dir, "..", "datasets", "questions.json")
+cache_dir = os.getenv("VECTOR_CACHE_DIR", os.path.join(current_dir, "..", "datasets", ".vector_cache"))
 
-# Initialize immediately for prototype simplicity (migth block startup for a few secs)
-vector_store = FaissVectorStore(dataset_path)
+# Not loaded at import: the API starts it in the background on startup,
+# and any direct caller of search() triggers it lazily.
+vector_store = FaissVectorStore(
+    question_bank,
+    cache_dir=cache_dir,
+    index_spec=IndexSpec.from_env(),
+    batch_size=int(os.getenv("VECTOR_BATCH_SIZE", "32")),
+    batch_wait_ms=float(os.getenv("VECTOR_BATCH_WAIT_MS", "5"))
+)
@@ -0,0 +1,101 @@
+import sys
+import os
+import time
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import faiss
+
+from rag_service.index_factory import IndexSpec, build_index, tune_index
+
+def synthetic_embeddings(n, dimension, clusters=256, seed=42):
+    # Clustered, L2-normalised vectors look far more like sentence embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype('float32')
+    labels = rng.integers(0, clusters, size=n)
+    data = centers[labels] + 0.35 * rng.standard_normal((n, dimension)).astype('float32')
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data
+
+def index_bytes(index):
+    return len(faiss.serialize_index(index))
+
+def recall_at_k(found, truth, k):
+    hits = 0
+    for row_found, row_truth in zip(found, truth):
+        hits += len(set(row_found[:k]) & set(row_truth[:k]))
+    return hits / (len(truth) * k)
+
+def timed_search(index, queries, k):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    return ids, len(queries) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k / QPS / memory of FAISS index kinds against exact Flat search")
+    parser.add_argument("--n", type=int, default=200000, help="Number of synthetic vectors")
+    parser.add_argument("--embeddings", help="Use a saved .npy matrix (e.g. datasets/.vector_cache/embeddings.npy)")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kinds", default="flat,ivf_flat,hnsw,ivf_pq")
+    parser.add_argument("--nprobe", default="1,4,16,64", help="Sweep for IVF indexes")
+    parser.add_argument("--ef_search", default="16,64,256", help="Sweep for HNSW")
+    parser.add_argument("--threads", type=int, default=0, help="FAISS OpenMP threads (0 = library default)")
+    args = parser.parse_args()
+
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+
+    if args.embeddings:
+        data = np.ascontiguousarray(np.load(args.embeddings), dtype='float32')
+    else:
+        print(f"Generating {args.n:,} synthetic {args.dim}-d vectors...")
+        data = synthetic_embeddings(args.n, args.dim)
+    dimension = data.shape[1]
+
+    rng = np.random.default_rng(7)
+    queries = data[rng.choice(len(data), size=args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype('float32')
+
+    # Ground truth from exact search
+    flat = build_index(IndexSpec("flat"), dimension, data)
+    truth, flat_qps = timed_search(flat, queries, args.k)
+
+    rows = []
+    for kind in args.kinds.split(","):
+        spec = IndexSpec(kind)
+        start = time.perf_counter()
+        index = flat if kind == "flat" else build_index(spec, dimension, data)
+        build_time = 0.0 if kind == "flat" else time.perf_counter() - start
+        memory_mb = index_bytes(index) / 1e6
+
+        if hasattr(index, "nprobe"):
+            sweep = [("nprobe", int(v)) for v in args.nprobe.split(",")]
+        elif hasattr(index, "hnsw"):
+            sweep = [("efSearch", int(v)) for v in args.ef_search.split(",")]
+        else:
+            sweep = [("-", None)]
+
+        for knob, value in sweep:
+            if knob == "nprobe":
+                spec.nprobe = value
+            elif knob == "efSearch":
+                spec.ef_search = value
+            tune_index(index, spec)
+            ids, qps = (truth, flat_qps) if kind == "flat" else timed_search(index, queries, args.k)
+            recall = recall_at_k(ids, truth, args.k)
+            label = f"{knob}={value}" if value is not None else "exact"
+            rows.append((kind, label, build_time, memory_mb, recall, qps))
+
+    print("\n" + "="*78)
+    print(f"N={len(data):,}  dim={dimension}  queries={len(queries)}  k={args.k}")
+    print("="*78)
+    print(f"{'index':<10} {'setting':<14} {'build (s)':>10} {'memory (MB)':>12} {f'recall@{args.k}':>10} {'QPS':>12}")
+    for kind, label, build_time, memory_mb, recall, qps in rows:
+        print(f"{kind:<10} {label:<14} {build_time:>10.2f} {memory_mb:>12.1f} {recall:>10.3f} {qps:>12,.0f}")
+
+if __name__ == "__main__":
+    main()
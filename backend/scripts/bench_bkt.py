@@ -0,0 +1,131 @@
+import sys
+import os
+import json
+import time
+import argparse
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from ml_engine.bkt import BKTModel, P_MAX
+from context_engine.storage import LearnerRecord
+from context_engine.learner_state import apply_answer
+
+# Replays an answer log through the knowledge-tracing model three ways and
+# reports updates/sec: the online O(1) update, the full per-answer apply path
+# the API runs, and the vectorized batch rescore used for nightly recalibration.
+#   python scripts/bench_bkt.py --learners 5000 --answers 100
+#   python scripts/bench_bkt.py --log answers.jsonl   (one {"user_id", "topic", "is_correct"} per line, oldest first)
+
+def simulate(learners, answers_per_learner, topics, seed):
+    """Synthetic log from a BKT-generated population: (user_ids, topic_names, correct), time-ordered per user."""
+    rng = np.random.default_rng(seed)
+    n = learners * answers_per_learner
+    user_ids = np.repeat(np.arange(learners), answers_per_learner)
+    topic_ids = rng.integers(0, topics, n)
+    known = rng.random((learners, topics)) < 0.3
+    correct = np.empty(n, dtype=bool)
+    noise = rng.random(n)
+    learn = rng.random(n) < 0.1
+    for i in range(n):
+        u, t = user_ids[i], topic_ids[i]
+        correct[i] = noise[i] < (0.9 if known[u, t] else 0.25)
+        known[u, t] |= learn[i]
+    return user_ids, [f"Topic {t}" for t in topic_ids], correct
+
+def read_log(path):
+    user_ids, topic_names, correct = [], [], []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            user_ids.append(int(entry["user_id"]))
+            topic_names.append(entry.get("topic", "General"))
+            correct.append(bool(entry["is_correct"]))
+    return np.array(user_ids), topic_names, np.array(correct)
+
+def replay_online(model, user_ids, topic_names, correct):
+    mastery = {}
+    users, flags = user_ids.tolist(), correct.tolist()
+    started = time.perf_counter()
+    for user_id, topic, is_correct in zip(users, topic_names, flags):
+        key = (user_id, topic)
+        previous = mastery.get(key)
+        if previous is None:
+            previous = model.prior(topic)
+        mastery[key] = model.update(previous, topic, is_correct)
+    return mastery, time.perf_counter() - started
+
+def replay_apply(user_ids, topic_names, correct):
+    # apply_answer uses the process-wide tracer; same parameters as the others when no params file is set
+    records = {}
+    users, flags = user_ids.tolist(), correct.tolist()
+    started = time.perf_counter()
+    for user_id, topic, is_correct in zip(users, topic_names, flags):
+        record = records.get(user_id)
+        if record is None:
+            record = records[user_id] = LearnerRecord(user_id, topic_mastery={})
+        apply_answer(record, {"topic": topic, "is_correct": is_correct, "confidence": 0.5})
+    return records, time.perf_counter() - started
+
+def replay_batch(model, user_ids, topic_names, correct):
+    started = time.perf_counter()
+    topic_ids = model.topic_ids(topic_names)
+    # One sequence per (user, topic), answers kept in log order within it
+    keys = user_ids.astype(np.int64) * (len(model) + 1) + topic_ids
+    order = np.argsort(keys, kind="stable")
+    unique_keys, sequence_ids = np.unique(keys[order], return_inverse=True)
+    grouped = time.perf_counter()
+    final, log_likelihood = model.rescore(sequence_ids, topic_ids[order], correct[order])
+    finished = time.perf_counter()
+    sequences = {(int(k // (len(model) + 1)), int(k % (len(model) + 1))): p for k, p in zip(unique_keys, final)}
+    return sequences, log_likelihood, grouped - started, finished - grouped
+
+def check_bounds(model, topic="Topic 0"):
+    """A saturated learner must still lose mastery on a wrong answer, on every path."""
+    index = model.topic_id(topic)
+    for p in (1.0, 1 - 1e-9, 0.999999):
+        after = model.update(p, topic, False)
+        assert 0 < after < min(p, P_MAX), f"update({p}, wrong) -> {after}"
+        batch = model.update_batch(np.array([p]), np.array([index]), np.array([False]))[0]
+        assert batch < 1.0 and abs(batch - after) < 1e-12, f"update_batch({p}, wrong) -> {batch}"
+    p = model.prior(topic)
+    for _ in range(500):
+        p = model.update(p, topic, True)
+    assert p < 1.0, "mastery reached exactly 1.0 after a run of correct answers"
+    final, log_likelihood = model.rescore(np.zeros(501, dtype=np.int64), np.full(501, index), [True] * 500 + [False])
+    assert final[0] < p and np.isfinite(log_likelihood), "rescore did not lower mastery after a wrong answer"
+
+def main():
+    parser = argparse.ArgumentParser(description="Knowledge-tracing replay throughput (updates/sec)")
+    parser.add_argument("--log", help="JSON Lines answer log; synthetic data if omitted")
+    parser.add_argument("--learners", type=int, default=2000)
+    parser.add_argument("--answers", type=int, default=100, help="Answers per synthetic learner")
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.log:
+        user_ids, topic_names, correct = read_log(args.log)
+        print(f"Replaying {len(correct):,} logged answers from {args.log}")
+    else:
+        print(f"Simulating {args.learners:,} learners x {args.answers} answers over {args.topics} topics...")
+        user_ids, topic_names, correct = simulate(args.learners, args.answers, args.topics, args.seed)
+    n = len(correct)
+
+    model = BKTModel()
+    check_bounds(model)
+    online, online_s = replay_online(model, user_ids, topic_names, correct)
+    _, apply_s = replay_apply(user_ids, topic_names, correct)
+    batch, log_likelihood, group_s, rescore_s = replay_batch(model, user_ids, topic_names, correct)
+
+    worst = max(abs(batch[(u, model.topic_index[t])] - p) for (u, t), p in online.items())
+    print(f"  online update()    {n / online_s:>14,.0f} updates/s  ({online_s:.2f}s)")
+    print(f"  apply_answer()     {n / apply_s:>14,.0f} updates/s  ({apply_s:.2f}s, full per-answer API path)")
+    print(f"  batch rescore()    {n / rescore_s:>14,.0f} updates/s  ({rescore_s:.2f}s + {group_s:.2f}s grouping, "
+          f"{len(batch):,} learner-topic sequences)")
+    print(f"  log-likelihood {log_likelihood:,.1f} ({log_likelihood / n:.4f}/answer) | "
+          f"max |online - batch| = {worst:.2e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import sys
+import os
+import gzip
+import json
+import time
+import random
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi.encoders import jsonable_encoder
+
+from api_gateway.responses import dumps_json, dumps_msgpack, msgpack, orjson
+from quiz_orchestrator.orchestrator import answer_response
+
+# /quiz/next body size and encode time: the old response (full question dict +
+# the learner's whole mastery map, FastAPI's default encoder) against the lean
+# one (client fields + mastery deltas) under each available encoder.
+#   python scripts/bench_payload.py --topics 20,200,1000
+
+def make_question():
+    return {
+        "id": "NEET_BIO_004213",
+        "topic": "Cell Structure and Function",
+        "difficulty": 3,
+        "question": "Which of the following organelles is the site of the Krebs cycle in eukaryotic cells?",
+        "options": ["Cytoplasm", "Mitochondrial matrix", "Inner mitochondrial membrane", "Ribosome"],
+        "correct": "Mitochondrial matrix",
+        "misconception": "Confusing the site of the electron transport chain with that of the Krebs cycle.",
+        "error_type": "fact_recall",
+        "common_wrong": "Inner mitochondrial membrane",
+        "source": "medmcqa"
+    }
+
+def make_learner_state(num_topics):
+    mastery = {f"Topic {i} - {random.choice(['Physiology', 'Organic Chemistry', 'Mechanics'])}": random.random()
+               for i in range(num_topics)}
+    topic = next(iter(mastery))
+    return {"topic_mastery": mastery, "confidence_avg": random.random(), "mastery_delta": {topic: 0.0312}}
+
+def old_response(question, learner_state, result, explanation):
+    state = {"topic_mastery": learner_state["topic_mastery"], "confidence_avg": learner_state["confidence_avg"]}
+    return {"result": result, "next_question": question, "explanation": explanation, "learner_state": state}
+
+def fastapi_default(content):
+    # What returning a dict from a route costs: jsonable_encoder walk + json.dumps
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+def time_encode(encode, content, iterations):
+    encode(content)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        encode(content)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+def bench(num_topics, iterations, with_explanation):
+    question = make_question()
+    learner_state = make_learner_state(num_topics)
+    result = {"question_id": question["id"], "is_correct": False, "correct": question["correct"],
+              "misconception": question["misconception"]}
+    explanation = ("The Krebs cycle runs in the mitochondrial matrix; the inner membrane hosts the "
+                   "electron transport chain. " * 3) if with_explanation else None
+
+    bodies = {
+        "old": old_response(question, learner_state, result, explanation),
+        "lean": answer_response(result, {"question": question}, explanation, learner_state)
+    }
+    encoders = [("fastapi-json", fastapi_default)]
+    if orjson is not None:
+        encoders.append(("orjson", dumps_json))
+    if msgpack is not None:
+        encoders.append(("msgpack", dumps_msgpack))
+
+    print(f"\n{num_topics} topics in learner state{' + explanation' if with_explanation else ''}:")
+    print(f"  {'body':<6}{'encoder':<14}{'bytes':>8}{'gzip':>8}{'encode us':>12}")
+    for body_name, body in bodies.items():
+        for encoder_name, encode in encoders:
+            raw = encode(body)
+            packed = gzip.compress(raw, compresslevel=6)
+            micros = time_encode(encode, body, iterations)
+            print(f"  {body_name:<6}{encoder_name:<14}{len(raw):>8}{len(packed):>8}{micros:>12.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload size and serialization time of /quiz/next responses")
+    parser.add_argument("--topics", default="20,200,1000", help="Comma-separated learner topic counts")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--explanation", action="store_true", help="Include an explanation paragraph")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    if orjson is None:
+        print("orjson not installed: lean responses fall back to the stdlib encoder")
+    if msgpack is None:
+        print("msgpack not installed: skipping MessagePack (pip install msgpack)")
+    for num_topics in [int(t) for t in args.topics.split(",")]:
+        bench(num_topics, args.iterations, args.explanation)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import sys
+import os
+import time
+import random
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from ml_engine.question_bank import QuestionBank
+from ml_engine.selector import AdaptiveSelector
+
+NUM_TOPICS = 200
+DIFFICULTIES = [1, 2, 3, 4, 5]
+
+def make_bank(size):
+    questions = []
+    for i in range(size):
+        questions.append({
+            "id": f"BENCH_{i}",
+            "topic": f"Topic {i % NUM_TOPICS}",
+            "difficulty": DIFFICULTIES[(i // NUM_TOPICS) % len(DIFFICULTIES)],
+            "options": ["A", "B", "C", "D"],
+            # Only questions with an answer key are servable; without one the bank is empty
+            "correct": "A",
+        })
+    return QuestionBank.from_questions(questions)
+
+def make_learner(num_topics=20):
+    topics = random.sample(range(NUM_TOPICS), num_topics)
+    return {
+        "topic_mastery": {f"Topic {t}": random.random() for t in topics},
+        "confidence_avg": random.random()
+    }
+
+def bench(size, calls, users):
+    print(f"Building bank of {size:,} questions...")
+    start = time.perf_counter()
+    bank = make_bank(size)
+    build_time = time.perf_counter() - start
+    if len(bank.servable) != size:
+        raise SystemExit(f"Only {len(bank.servable):,} of {size:,} synthetic questions are servable")
+
+    selector = AdaptiveSelector(bank)
+    learners = [make_learner() for _ in range(users)]
+
+    # Warm-up so the first timed calls don't pay for allocation of recent-history entries
+    for i in range(min(calls, users)):
+        selector.select(learners[i], user_id=i)
+
+    latencies = []
+    for i in range(calls):
+        uid = i % users
+        t0 = time.perf_counter_ns()
+        selector.select(learners[uid], user_id=uid)
+        latencies.append(time.perf_counter_ns() - t0)
+
+    latencies.sort()
+    mean = sum(latencies) / len(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f"  build {build_time:.2f}s | mean {mean/1000:.2f}us | p50 {p50/1000:.2f}us | p99 {p99/1000:.2f}us")
+    return mean, p50, p99
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call latency of AdaptiveSelector.select at several bank sizes")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="Comma-separated bank sizes")
+    parser.add_argument("--calls", type=int, default=100000, help="Timed selections per size")
+    parser.add_argument("--users", type=int, default=1000, help="Distinct simulated learners")
+    args = parser.parse_args()
+
+    random.seed(42)
+    results = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        results.append((size,) + bench(size, args.calls, args.users))
+
+    print("\n" + "="*56)
+    print(f"{'bank size':>12} {'mean (us)':>12} {'p50 (us)':>12} {'p99 (us)':>12}")
+    print("="*56)
+    for size, mean, p50, p99 in results:
+        print(f"{size:>12,} {mean/1000:>12.2f} {p50/1000:>12.2f} {p99/1000:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import sys
+import os
+import time
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from rag_service.vector_store import vector_store
+from rag_service.neighbors import NeighborTable, neighbor_table
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute top-k neighbours for every bank question")
+    parser.add_argument("--k", type=int, default=8, help="Neighbours stored per question (lookups can ask for up to k)")
+    args = parser.parse_args()
+
+    print("Loading vector store...")
+    if not vector_store.wait_until_ready():
+        print(f"Vector store failed to initialize: {vector_store.error}")
+        return
+
+    start = time.time()
+    embeddings = vector_store.document_embeddings()
+    ids = [doc['id'] for doc in vector_store.documents]
+
+    print(f"Computing {args.k} neighbours for {len(ids)} questions...")
+    table = NeighborTable.compute(vector_store.index, embeddings, args.k)
+    neighbor_table.save(ids, table)
+
+    print(f"Saved {table.shape} neighbor table to {neighbor_table.matrix_path} in {time.time() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
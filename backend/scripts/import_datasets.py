@@ -1,9 +1,13 @@
-import json
+import sys
 import os
+import argparse
 from datasets import load_dataset
-import random
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-OUTPUT_FILE = "datasets/questions.json"
+from ml_engine.question_import import add_import_arguments, run_import
+
+DATASET = "openlifescienceai/medmcqa"
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(__file__), '..', 'datasets', '.medmcqa_import.json')
 
 def format_medmcqa(example, index):
     # MedMCQA structure: question, opa, opb, opc, opd, cop (1-indexed usually), subject_name, topic_name
@@ -30,37 +34,30 @@ def format_medmcqa(example, index):
         "options": options,
         "correct": correct_answer,
         "misconception": None, # Will need LLM to generate these in future
-        "error_type": "conceptual"
+        "error_type": "conceptual",
+        "source": "medmcqa"
     }
 
+def open_rows(split):
+    def rows_from(start):
+        # streaming=True iterates the split lazily instead of materializing 180k rows
+        ds = load_dataset(DATASET, split=split, streaming=True)
+        return iter(ds.skip(start) if start else ds)
+    return rows_from
+
 def main():
-    print("Loading MedMCQA...")
+    parser = argparse.ArgumentParser(description="Stream MedMCQA into the question bank (resumable)")
+    parser.add_argument("--split", default="train")
+    add_import_arguments(parser, DEFAULT_CHECKPOINT)
+    args = parser.parse_args()
+
+    print(f"Streaming {DATASET} [{args.split}]...")
     try:
-        # Load a small subset to avoid huge files for this demo
-        ds = load_dataset("openlifescienceai/medmcqa", split="train[:50]")
-        
-        new_questions = []
-        for i, item in enumerate(ds):
-            q = format_medmcqa(item, i)
-            if q:
-                new_questions.append(q)
-                
-        print(f"Loaded {len(new_questions)} questions from MedMCQA.")
-        
-        # Load existing
-        if os.path.exists(OUTPUT_FILE):
-            with open(OUTPUT_FILE, 'r') as f:
-                existing = json.load(f)
-        else:
-            existing = []
-            
-        combined = existing + new_questions
-        
-        with open(OUTPUT_FILE, 'w') as f:
-            json.dump(combined, f, indent=2)
-            
-        print(f"Successfully saved {len(combined)} questions to {OUTPUT_FILE}")
-        
+        # Row position is the id suffix, so ids stay stable across resumed runs
+        convert = lambda position, example: format_medmcqa(example, position)
+        run_import(args, open_rows(args.split), convert, "MedMCQA")
+    except KeyboardInterrupt:
+        print("Interrupted; re-run to resume from the last checkpoint.")
     except Exception as e:
         print(f"Error loading dataset: {e}")
 
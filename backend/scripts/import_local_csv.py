@@ -1,25 +1,34 @@
+import sys
 import csv
-import json
 import re
 import os
+import time
+import argparse
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from ml_engine.question_import import add_import_arguments, run_import, StageStats
+from ml_engine.question_store import UNSOLVED, content_hash
 
 INPUT_FILE = r"F:\product\neet\subjects-questions.csv"
-OUTPUT_FILE = "datasets/questions.json"
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(__file__), '..', 'datasets', '.csv_import.json')
+
+# Compiled once per process instead of on every row.
+# Option A like A. or (A) or A) or A . at the start of a line or after a newline
+OPTION_A = re.compile(r'(?:^|\n)\s*(?:A\.|A\s\.|A\)|\[A\]|\(A\))\s+', re.IGNORECASE)
+# Any option marker A-D, used to split the options block
+OPTION_SPLIT = re.compile(r'(?:^|\n)\s*(?:[A-D]\.|[A-D]\s\.|[A-D]\)|\[[A-D]\]|\([A-D]\))\s+', re.IGNORECASE)
 
 def parse_question_text(text):
     """
     Attempts to separate question text from options (A, B, C, D).
     Returns (question_text, options_list)
     """
-    # Regex to find options like A. or (A) or A) or A .
-    # We look for A, B, C, D at the start of a line or after a newline
-    
     # We will try to find the indices of the options
     # This is a heuristic approach
-    
-    # Pattern for Option A
-    pattern_a = r'(?:^|\n)\s*(?:A\.|A\s\.|A\)|\[A\]|\(A\))\s+'
-    match_a = re.search(pattern_a, text, re.IGNORECASE)
+    match_a = OPTION_A.search(text)
     
     if not match_a:
         return text.strip(), []
@@ -29,9 +38,7 @@ def parse_question_text(text):
     options_part = text[start_a:]
     
     # Now try to split options_part
-    # We use a splitting regex
-    split_pattern = r'(?:^|\n)\s*(?:[A-D]\.|[A-D]\s\.|[A-D]\)|\[[A-D]\]|\([A-D]\))\s+'
-    parts = re.split(split_pattern, options_part, flags=re.IGNORECASE)
+    parts = OPTION_SPLIT.split(options_part)
     
     # parts[0] should be empty if the string starts with A.
     # parts[1] is A, parts[2] is B, etc.
@@ -40,68 +47,104 @@ def parse_question_text(text):
     
     return question_part, options
 
+def format_row(position, row):
+    """One CSV row as a question dict, or None if it doesn't parse into 4+ options."""
+    if len(row) < 2:
+        return None
+
+    text = row[0]
+    subject = row[1]
+
+    question_text, options = parse_question_text(text)
+
+    # Filter out bad parses
+    if len(options) < 4:
+        return None # simplify for now
+
+    item = {
+        "topic": subject,
+        "difficulty": 3, # Unknown
+        "question": question_text,
+        "options": options[:4], # Ensure max 4
+        "correct": UNSOLVED, # We don't have the answer key
+        "misconception": None,
+        "error_type": "conceptual",
+        "source": "subjects-questions.csv"
+    }
+    # Content-derived id: stable across resumes and edits elsewhere in the file, and
+    # in its own namespace so it can never land on the seeded CSV_<n> questions
+    item["id"] = f"CSVH_{content_hash(item)[:16]}"
+    return item
+
+def parse_chunk(start, rows):
+    """Worker entry point: formats a run of rows beginning at position start."""
+    started = time.perf_counter()
+    items = [format_row(start + i, row) for i, row in enumerate(rows)]
+    return items, time.perf_counter() - started
+
+def read_rows(path, start):
+    with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None) # Skip header
+        # csv rows can span lines, so resume by row count rather than byte offset
+        yield from itertools.islice(reader, start, None)
+
+def open_rows(path, workers=1, parse_chunk_size=2000, stats=None):
+    """
+    open_rows(start) for import_stream, yielding parsed questions (None for
+    rejects) in file order. With workers > 1, chunks of raw rows are parsed on a
+    process pool; a window of 2 * workers chunks in flight bounds memory and
+    the reader never runs further ahead than that.
+    """
+    stats = stats or StageStats()
+
+    def parsed(items, seconds):
+        stats.add("parsed", len(items), seconds)
+        return items
+
+    def rows_from(start):
+        raw = read_rows(path, start)
+        chunks = iter(lambda: list(itertools.islice(raw, parse_chunk_size)), [])
+        position = start
+
+        if workers <= 1:
+            for rows in chunks:
+                items, seconds = parse_chunk(position, rows)
+                position += len(rows)
+                yield from parsed(items, seconds)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for rows in chunks:
+                pending.append(pool.submit(parse_chunk, position, rows))
+                position += len(rows)
+                if len(pending) >= 2 * workers:
+                    yield from parsed(*pending.popleft().result())
+            while pending:
+                yield from parsed(*pending.popleft().result())
+
+    return rows_from
+
 def main():
-    print(f"Reading from {INPUT_FILE}...")
-    
-    new_questions = []
-    
-    try:
-        with open(INPUT_FILE, 'r', encoding='utf-8', errors='replace') as f:
-            reader = csv.reader(f)
-            header = next(reader, None) # Skip header
-            
-            count = 0
-            limit = 50 # For safety in this demo, parse 50. Increase later.
-            
-            for row in reader:
-                if len(row) < 2:
-                    continue
-                    
-                text = row[0]
-                subject = row[1]
-                
-                question_text, options = parse_question_text(text)
-                
-                # Filter out bad parses
-                if len(options) < 4:
-                    continue # simplify for now
-                
-                # Create question object
-                q = {
-                    "id": f"CSV_{count}",
-                    "topic": subject,
-                    "difficulty": 3, # Unknown
-                    "question": question_text,
-                    "options": options[:4], # Ensure max 4
-                    "correct": "Unknown", # We don't have the answer key
-                    "misconception": None,
-                    "error_type": "conceptual",
-                    "source": "subjects-questions.csv"
-                }
-                
-                new_questions.append(q)
-                count += 1
-                if count >= limit:
-                    break
-                    
-        print(f"Parsed {len(new_questions)} questions from CSV.")
-        
-        # Load existing
-        existing = []
-        if os.path.exists(OUTPUT_FILE):
-            with open(OUTPUT_FILE, 'r') as f:
-                existing = json.load(f)
-        
-        # Merge
-        combined = existing + new_questions
-        
-        with open(OUTPUT_FILE, 'w') as f:
-            json.dump(combined, f, indent=2)
-            
-        print(f"Successfully saved {len(combined)} questions to {OUTPUT_FILE}")
+    parser = argparse.ArgumentParser(description="Stream a questions CSV into the question bank (resumable)")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Parser processes (1 parses inline)")
+    parser.add_argument("--parse_chunk", type=int, default=2000, help="Rows per parse task")
+    add_import_arguments(parser, DEFAULT_CHECKPOINT)
+    args = parser.parse_args()
 
+    print(f"Reading from {args.input} with {args.workers} parser worker(s)...")
+    stats = StageStats()
+    try:
+        # Rows arrive already formatted by the workers
+        run_import(args, open_rows(args.input, args.workers, args.parse_chunk, stats),
+                   lambda position, item: item, "CSV import", stats)
     except FileNotFoundError:
-        print(f"File not found: {INPUT_FILE}")
+        print(f"File not found: {args.input}")
+    except KeyboardInterrupt:
+        print("Interrupted; re-run to resume from the last checkpoint.")
     except Exception as e:
         print(f"Error: {e}")
 
@@ -0,0 +1,99 @@
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse, JSONResponse
+
+from rag_service.llm_client import mock_completion
+
+# Deterministic OpenAI-compatible server for local runs and load tests:
+#   python scripts/llm_stub_server.py --port 9000
+#   LLM_BACKEND=openai LLM_BASE_URL=http://localhost:9000/v1 uvicorn api_gateway.main:app
+
+app = FastAPI(title="LLM Stub")
+TOKEN_DELAY = float(os.getenv("LLM_STUB_TOKEN_DELAY", "0.02"))
+# Simulated provider behaviour for exercising clients (e.g. the answer solver's retries)
+LATENCY = float(os.getenv("LLM_STUB_LATENCY", "0"))
+ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+
+def _reply(body):
+    # A JSON-mode request (e.g. the answer solver) gets a valid JSON object back
+    messages = body.get("messages", [])
+    prompt = messages[-1]["content"] if messages else ""
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps({
+            "correct_option_text": _first_option(prompt),
+            "misconception": "Stub misconception description.",
+            "difficulty": 3,
+            "error_type": "conceptual"
+        })
+    return mock_completion(prompt)
+
+def _first_option(prompt):
+    start = prompt.find("Options:")
+    if start == -1:
+        return "Unknown"
+    try:
+        options = json.loads(prompt[start + len("Options:"):].strip().splitlines()[0])
+        return options[0] if options else "Unknown"
+    except (ValueError, IndexError):
+        return "Unknown"
+
+def _chunk(model, content=None, finish_reason=None):
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+
+@app.post("/v1/chat/completions")
+async def chat_completions(body: dict):
+    model = body.get("model", "stub")
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        return JSONResponse(
+            {"error": {"message": "Stub rate limit", "type": "rate_limit_error"}},
+            status_code=429, headers={"retry-after": "0.5"}
+        )
+    text = _reply(body)
+
+    if not body.get("stream"):
+        if LATENCY:
+            await asyncio.sleep(LATENCY)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": len(text.split())}
+        }
+
+    async def events():
+        for word in text.split(" "):
+            await asyncio.sleep(TOKEN_DELAY)
+            yield f"data: {json.dumps(_chunk(model, word + ' '))}\n\n"
+        yield f"data: {json.dumps(_chunk(model, finish_reason='stop'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="Seconds per non-streaming completion")
+    parser.add_argument("--error_rate", type=float, default=ERROR_RATE, help="Fraction of requests answered with 429")
+    args = parser.parse_args()
+    LATENCY = args.latency
+    ERROR_RATE = args.error_rate
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -0,0 +1,40 @@
+import sys
+import os
+import json
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database.session import SessionLocal, engine
+from database.models import Base
+from ml_engine.question_store import ensure_question_table, upsert_questions, count_questions
+
+DEFAULT_FILE = os.path.join(os.path.dirname(__file__), '..', 'datasets', 'questions.json')
+
+def load(path, batch_size=1000):
+    """
+    Bulk-upserts a questions.json file into the questions table.
+    Rows are keyed by id, so re-running updates edited questions in place.
+    """
+    ensure_question_table(engine)
+    Base.metadata.create_all(bind=engine)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    db = SessionLocal()
+    try:
+        written = upsert_questions(db, data, batch_size=batch_size)
+        db.commit()
+        print(f"✅ Upserted {written} questions from {path} ({count_questions(db)} in table).")
+    except Exception as e:
+        print(f"❌ Load failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a questions.json file into the questions table")
+    parser.add_argument("--file", default=DEFAULT_FILE)
+    parser.add_argument("--batch_size", type=int, default=1000)
+    args = parser.parse_args()
+    load(args.file, args.batch_size)
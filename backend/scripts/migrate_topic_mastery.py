@@ -0,0 +1,56 @@
+import sys
+import os
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import select, update
+
+from database.session import SessionLocal, engine
+from database.models import Base, LearnerState, TopicMastery
+from database.upsert import upsert_statement
+
+def migrate(batch_size=1000, clear_json=False):
+    """
+    Copies learner_state.topic_mastery JSON blobs into topic_mastery rows.
+    Existing rows win (ON CONFLICT DO NOTHING), so it is safe to re-run on a
+    live database.
+    """
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        stmt = upsert_statement(TopicMastery, engine.dialect.name, ["user_id", "topic"])
+        query = select(LearnerState.user_id, LearnerState.topic_mastery, LearnerState.last_updated).where(
+            LearnerState.topic_mastery.isnot(None)
+        )
+
+        learners = 0
+        rows = []
+        for user_id, mastery, last_updated in db.execute(query).yield_per(batch_size):
+            learners += 1
+            for topic, score in (mastery or {}).items():
+                rows.append({"user_id": user_id, "topic": topic, "mastery": score, "attempts": 0, "last_seen": last_updated})
+            if len(rows) >= batch_size:
+                db.execute(stmt, rows)
+                rows = []
+        if rows:
+            db.execute(stmt, rows)
+
+        if clear_json:
+            db.execute(update(LearnerState).values(topic_mastery=None))
+
+        db.commit()
+        print(f"✅ Migrated topic mastery for {learners} learners.")
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move learner_state.topic_mastery JSON into the topic_mastery table")
+    parser.add_argument("--batch_size", type=int, default=1000)
+    parser.add_argument("--clear_json", action="store_true", help="Null out the legacy JSON column afterwards")
+    args = parser.parse_args()
+    migrate(args.batch_size, args.clear_json)
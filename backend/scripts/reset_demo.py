@@ -3,7 +3,7 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from database.session import SessionLocal, engine
-from database.models import Base, LearnerState, Mistake
+from database.models import Base, LearnerState, TopicMastery, Mistake
 from sqlalchemy import text
 
 def reset_demo_state():
@@ -21,6 +21,7 @@ def reset_demo_state():
         
         # Delete learner state
         db.query(LearnerState).delete()
+        db.query(TopicMastery).delete()
         print("✅ Cleared Learner mastery state.")
         
         db.commit()
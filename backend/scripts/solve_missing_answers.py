@@ -1,14 +1,36 @@
+import sys
 import json
 import os
+import time
+import random
+import asyncio
+import hashlib
 import argparse
-from openai import OpenAI
+import httpx
+import openai
+from openai import AsyncOpenAI
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-# Setup
-INPUT_FILE = "datasets/questions.json"
-OUTPUT_FILE = "datasets/questions.json"
+from sqlalchemy import select
+
+from database.session import SessionLocal
+from database.models import Question
+from ml_engine.question_store import UNSOLVED, question_item, upsert_questions, content_hash
+from rag_service.rate_limit import TokenBucket
+
+# Concurrent answer-key solver for questions imported with correct == "Unknown".
+#   python scripts/solve_missing_answers.py --concurrency 32 --rps 20
+#   python scripts/solve_missing_answers.py --base_url http://localhost:9000/v1   (scripts/llm_stub_server.py)
+# Safe to interrupt: solved rows are upserted in small batches and every
+# response is cached on disk, so a rerun picks up the rest without paying twice.
+
+# Put on the results queue once every worker is done; the writer flushes and exits
+_DONE = object()
+
+DEFAULT_CACHE = os.path.join(os.path.dirname(__file__), '..', 'datasets', '.solver_cache.jsonl')
 
 SOLVER_SYSTEM_PROMPT = """
-You are an expert academic tutor for NEET (Medical Entrance). 
+You are an expert academic tutor for NEET (Medical Entrance).
 Your task is to solve the multiple-choice question provided.
 
 Output Format (JSON only):
@@ -21,83 +43,303 @@ Output Format (JSON only):
 
 Ensure 'correct_option_text' matches one of the provided options EXACTLY.
 """
+# Part of the cache key: bump it when the prompt changes so old answers aren't reused
+PROMPT_VERSION = 1
 
-def solve_question(client, q):
-    try:
-        prompt = f"""
+def user_prompt(q):
+    return f"""
         Question: {q['question']}
         Options: {json.dumps(q['options'])}
         """
-        
-        response = client.chat.completions.create(
-            model="gpt-4o", # or gpt-3.5-turbo
+
+def apply_solution(q, result):
+    q["correct"] = result.get("correct_option_text") or (q["options"][0] if q["options"] else "Unknown")
+    q["misconception"] = result.get("misconception")
+    q["difficulty"] = result.get("difficulty", 3)
+    q["error_type"] = result.get("error_type", "conceptual")
+    return q
+
+def mock_solution(q):
+    return {
+        "correct_option_text": q["options"][0] if q["options"] else "Unknown",
+        "misconception": "Mock misconception description.",
+        "difficulty": 3
+    }
+
+class ResponseCache:
+    """
+    Solver responses on disk, one JSON line per question, keyed by
+    (model, prompt version, question content hash). Appends are flushed per
+    entry, so a crash loses at most the line being written.
+    """
+
+    def __init__(self, path, model):
+        self.path = path
+        self.model = model
+        self._entries = {}
+        self._file = None
+        self.hits = 0
+
+    def key(self, q):
+        raw = f"{self.model}\n{PROMPT_VERSION}\n{content_hash(q)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+    def open(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue # torn last line from an interrupted run
+                    self._entries[entry["key"]] = entry["response"]
+        self._file = open(self.path, 'a', encoding='utf-8')
+        return self
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+    def get(self, q):
+        response = self._entries.get(self.key(q))
+        if response is not None:
+            self.hits += 1
+        return response
+
+    def put(self, q, response):
+        key = self.key(q)
+        self._entries[key] = response
+        self._file.write(json.dumps({"key": key, "id": q["id"], "response": response}) + "\n")
+        self._file.flush()
+
+    def __len__(self):
+        return len(self._entries)
+
+class Solver:
+    """One LLM call per question: rate-limited by a shared token bucket, retried with backoff."""
+
+    def __init__(self, client, model, bucket, max_retries=5, backoff=1.0, max_backoff=30.0):
+        self.client = client
+        self.model = model
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.calls = 0
+        self.retries = 0
+
+    async def _call(self, q):
+        response = await self.client.chat.completions.create(
+            model=self.model,
             messages=[
                 {"role": "system", "content": SOLVER_SYSTEM_PROMPT},
-                {"role": "user", "content": prompt}
+                {"role": "user", "content": user_prompt(q)}
             ],
             response_format={"type": "json_object"},
             temperature=0.0
         )
-        
-        content = response.choices[0].message.content
-        data = json.loads(content)
-        return data
-    except Exception as e:
-        print(f"Error solving question {q.get('id')}: {e}")
-        return None
+        return json.loads(response.choices[0].message.content)
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--api_key", help="OpenAI API Key")
-    parser.add_argument("--mock", action="store_true", help="Use mock data instead of API")
-    args = parser.parse_args()
+    def _delay(self, attempt, error):
+        # Honour Retry-After on 429s; otherwise exponential backoff with full jitter
+        retry_after = getattr(getattr(error, "response", None), "headers", {}).get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    async def solve(self, q):
+        retryable = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                     openai.InternalServerError, ValueError)
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            self.calls += 1
+            try:
+                return await self._call(q)
+            except retryable as e:
+                if attempt == self.max_retries:
+                    print(f"Error solving question {q.get('id')}: {e}")
+                    return None
+                delay = self._delay(attempt, e)
+                if isinstance(e, openai.RateLimitError):
+                    # Slow everyone down, not just this worker
+                    self.bucket.penalize(delay)
+                self.retries += 1
+                await asyncio.sleep(delay)
+            except Exception as e:
+                print(f"Error solving question {q.get('id')}: {e}")
+                return None
 
-    # Load Data
-    if not os.path.exists(INPUT_FILE):
-        print(f"File {INPUT_FILE} not found.")
-        return
+def unsolved_pages(page_size):
+    """Unknown-answer questions in id order, one page per query (keyset, flat memory)."""
+    last_id = ""
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Question)
+                .where(Question.correct == UNSOLVED, Question.id > last_id)
+                .order_by(Question.id)
+                .limit(page_size)
+            ).scalars().all()
+            page = [question_item(r) for r in rows]
+        finally:
+            db.close()
+        if not page:
+            return
+        last_id = page[-1]["id"]
+        yield page
 
-    with open(INPUT_FILE, 'r') as f:
-        questions = json.load(f)
+def save_batch(batch):
+    db = SessionLocal()
+    try:
+        upsert_questions(db, batch)
+        db.commit()
+    finally:
+        db.close()
 
-    # Initialize Client
+async def run(args):
     client = None
     if not args.mock:
         api_key = args.api_key or os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            print("Error: No API Key provided. Set OPENAI_API_KEY or use --api_key or --mock.")
+        if not api_key and not args.base_url:
+            print("Error: No API Key provided. Set OPENAI_API_KEY or use --api_key, --base_url or --mock.")
             return
-        client = OpenAI(api_key=api_key)
-
-    solved_count = 0
-    
-    print(f"Scanning {len(questions)} questions...")
-
-    for q in questions:
-        if q.get("correct") == "Unknown":
-            print(f"Solving {q['id']}...")
-            
-            if args.mock:
-                # Mock Solver
-                q["correct"] = q["options"][0] if q["options"] else "Unknown"
-                q["misconception"] = "Mock misconception description."
-                q["difficulty"] = 3
-                solved_count += 1
-            else:
-                # LLM Solver
-                result = solve_question(client, q)
-                if result:
-                    q["correct"] = result.get("correct_option_text", q["options"][0])
-                    q["misconception"] = result.get("misconception")
-                    q["difficulty"] = result.get("difficulty", 3)
-                    q["error_type"] = result.get("error_type", "conceptual")
-                    solved_count += 1
-                    
-    # Save
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(questions, f, indent=2)
-
-    print(f"Solved and updated {solved_count} questions.")
+        # One keep-alive pool sized to the worker count; retries are ours, not the SDK's
+        http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency),
+            timeout=httpx.Timeout(args.timeout, connect=10.0)
+        )
+        client = AsyncOpenAI(api_key=api_key or "not-needed", base_url=args.base_url, http_client=http, max_retries=0)
+
+    solver = Solver(client, args.model, TokenBucket(args.rps, args.burst), max_retries=args.max_retries)
+    cache = ResponseCache(args.cache, args.model).open()
+    print(f"Response cache: {len(cache)} entries")
+
+    work = asyncio.Queue(maxsize=args.concurrency * 4)
+    results = asyncio.Queue()
+    stats = {"queued": 0, "solved": 0, "failed": 0, "saved": 0}
+    # Solved but not yet upserted; only cleared once the write commits
+    unsaved = []
+    started = time.monotonic()
+
+    async def produce():
+        pages = unsolved_pages(args.page_size)
+        while True:
+            page = await asyncio.to_thread(next, pages, None)
+            if page is None:
+                break
+            for q in page:
+                await work.put(q)
+                stats["queued"] += 1
+                if args.limit and stats["queued"] >= args.limit:
+                    return
+
+    async def worker():
+        while True:
+            q = await work.get()
+            try:
+                if args.mock:
+                    result = mock_solution(q)
+                else:
+                    result = cache.get(q)
+                    if result is None:
+                        result = await solver.solve(q)
+                        if result is not None:
+                            cache.put(q, result)
+                if result is None:
+                    stats["failed"] += 1
+                else:
+                    await results.put(apply_solution(q, result))
+                    stats["solved"] += 1
+            except Exception as e:
+                # One bad row must not kill the worker (work.join() would never return)
+                print(f"Error solving question {q.get('id')}: {e!r}")
+                stats["failed"] += 1
+            finally:
+                work.task_done()
+
+    async def save(batch):
+        await asyncio.to_thread(save_batch, batch)
+        del unsaved[:len(batch)]
+        stats["saved"] += len(batch)
+
+    async def writer():
+        # Checkpoint: upsert solved rows every save_every results or flush_interval seconds
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = await asyncio.wait_for(results.get(), args.flush_interval)
+            except asyncio.TimeoutError:
+                item = None
+            if item is _DONE:
+                if unsaved:
+                    await save(list(unsaved))
+                return
+            if item is not None:
+                unsaved.append(item)
+            if unsaved and (len(unsaved) >= args.save_every or time.monotonic() - last_flush >= args.flush_interval):
+                await save(list(unsaved))
+                elapsed = time.monotonic() - started
+                print(f"  saved {stats['saved']} | failed {stats['failed']} | "
+                      f"{stats['solved'] / max(elapsed, 1e-9):.1f} solved/s | {solver.calls} calls, {solver.retries} retries")
+                last_flush = time.monotonic()
+
+    workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+    writer_task = asyncio.create_task(writer())
+    try:
+        await produce()
+        await work.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        # Stop the writer by sentinel, not cancel(), so an item it already took is never dropped
+        await results.put(_DONE)
+        try:
+            await writer_task
+        except Exception as e:
+            print(f"Error saving solved questions: {e}")
+        # Anything the writer couldn't save (upserts are idempotent, so retrying a batch is safe)
+        pending = list(unsaved)
+        while not results.empty():
+            item = results.get_nowait()
+            if item is not _DONE:
+                pending.append(item)
+        if pending:
+            await asyncio.to_thread(save_batch, pending)
+            stats["saved"] += len(pending)
+        cache.close()
+        if client is not None:
+            await client.close()
+
+    elapsed = time.monotonic() - started
+    print(f"Solved and updated {stats['saved']} questions ({stats['failed']} failed, {cache.hits} from cache, "
+          f"{solver.calls} API calls, {solver.retries} retries) in {elapsed:.1f}s.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill in answer keys for questions with correct == 'Unknown'")
+    parser.add_argument("--api_key", help="OpenAI API Key")
+    parser.add_argument("--base_url", default=os.getenv("LLM_BASE_URL"), help="OpenAI-compatible endpoint (e.g. the local stub)")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--mock", action="store_true", help="Use mock data instead of API")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight")
+    parser.add_argument("--rps", type=float, default=10.0, help="Token bucket refill rate (requests/second)")
+    parser.add_argument("--burst", type=float, default=None, help="Token bucket size (default: rps)")
+    parser.add_argument("--max_retries", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout (seconds)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="Persistent response cache (JSON Lines)")
+    parser.add_argument("--save_every", type=int, default=100, help="Rows per checkpoint upsert")
+    parser.add_argument("--flush_interval", type=float, default=5.0, help="Max seconds between checkpoints")
+    parser.add_argument("--page_size", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many questions")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("Interrupted; solved rows so far are saved and cached. Re-run to continue.")
 
 if __name__ == "__main__":
     main()
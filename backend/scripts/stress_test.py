@@ -1,61 +1,310 @@
-import requests
+import sys
+import os
+import json
 import time
-import concurrent.futures
 import random
+import asyncio
+import argparse
+import httpx
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-API_URL = "http://localhost:8000/quiz/next"
-NUM_REQUESTS = 100
-CONCURRENT_THREADS = 10
+# Open-loop load harness: learner sessions arrive at a fixed rate whether or not
+# earlier ones have finished, so a slow server shows up as growing latency and
+# errors instead of quietly lowering the offered load.
+#   python scripts/stress_test.py --rate 5 --duration 60 --answers 10 --output run.json
+#   python scripts/stress_test.py --rate 5 --duration 60 --compare run.json
+# Each session: signup, login, first question, N answers (a mix of right and
+# wrong), a mistake-log entry for each wrong answer. --api batched replays the
+# same sitting through /quiz/session and /quiz/answers instead.
 
-def fetch_question(i):
-    start_time = time.time()
-    try:
-        response = requests.post(API_URL, json={
-            "user_id": f"stress_tester_{i}", 
-            "question_id": "INIT", 
-            "answer": "START",
-            "time_taken": 0,
-            "confidence": 0
+class Recorder:
+    """Latency samples and error counts per endpoint, plus completions per time bucket."""
+
+    def __init__(self, bucket_seconds=1.0):
+        self.bucket_seconds = bucket_seconds
+        self.started = time.monotonic()
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+        self.timeline = {}
+
+    def add(self, endpoint, seconds, status):
+        ok = status is not None and status < 400
+        self.latencies.setdefault(endpoint, []).append(seconds * 1000)
+        self.statuses.setdefault(endpoint, {})
+        key = str(status) if status is not None else "exception"
+        self.statuses[endpoint][key] = self.statuses[endpoint].get(key, 0) + 1
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        bucket = int((time.monotonic() - self.started) / self.bucket_seconds)
+        slot = self.timeline.setdefault(bucket, [0, 0])
+        slot[0] += 1
+        slot[1] += 0 if ok else 1
+
+    def summary(self):
+        endpoints = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            errors = self.errors.get(endpoint, 0)
+            endpoints[endpoint] = {
+                "count": len(samples),
+                "errors": errors,
+                "error_rate": errors / len(samples),
+                "mean_ms": sum(samples) / len(samples),
+                "p50_ms": percentile(samples, 50),
+                "p95_ms": percentile(samples, 95),
+                "p99_ms": percentile(samples, 99),
+                "max_ms": samples[-1],
+                "statuses": self.statuses.get(endpoint, {})
+            }
+        timeline = [{"t": bucket * self.bucket_seconds, "requests": n, "errors": e,
+                     "rps": n / self.bucket_seconds}
+                    for bucket, (n, e) in sorted(self.timeline.items())]
+        return endpoints, timeline
+
+def percentile(sorted_samples, p):
+    # Nearest-rank on an already sorted list
+    index = max(0, min(len(sorted_samples) - 1, int(round(p / 100 * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+class Session:
+    """One scripted learner. Answer keys learned from graded responses are shared across sessions."""
+
+    def __init__(self, client, recorder, args, index, known_keys):
+        self.client = client
+        self.recorder = recorder
+        self.args = args
+        self.email = f"load_{args.run_id}_{index}@example.com"
+        self.known_keys = known_keys
+        self.token = None
+
+    async def call(self, method, path, label=None, **kwargs):
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.add(label or f"{method} {path}", time.perf_counter() - started, None)
+            if self.args.verbose:
+                print(f"  {method} {path}: {e!r}")
+            return None
+        self.recorder.add(label or f"{method} {path}", time.perf_counter() - started, response.status_code)
+        if response.status_code >= 400:
+            if self.args.verbose:
+                print(f"  {method} {path}: {response.status_code} {response.text[:200]}")
+            return None
+        return response.json()
+
+    def pick_answer(self, question):
+        options = question.get("options") or []
+        if not options:
+            return ""
+        correct = self.known_keys.get(question["id"])
+        if correct is None:
+            return random.choice(options)
+        if random.random() < self.args.correct_ratio:
+            return correct
+        wrong = [o for o in options if o != correct]
+        return random.choice(wrong) if wrong else correct
+
+    async def think(self):
+        if self.args.think > 0:
+            await asyncio.sleep(random.expovariate(1 / self.args.think))
+
+    async def run(self):
+        credentials = {"email": self.email, "password": self.args.password}
+        data = await self.call("POST", "/auth/signup", json=credentials)
+        if data is None:
+            return False
+        data = await self.call("POST", "/auth/login", json=credentials)
+        if data is None:
+            return False
+        self.token = data["access_token"]
+
+        if self.args.api == "batched":
+            return await self.run_batched()
+
+        data = await self.call("POST", "/quiz/next", label="POST /quiz/next (start)", json={
+            "question_id": "INIT", "answer": "START", "time_taken": 0, "confidence": 0
         })
-        elapsed = time.time() - start_time
-        if response.status_code == 200:
-            return True, elapsed, response.json().get('next_question', {}).get('id')
-        else:
-            return False, elapsed, f"Status {response.status_code}"
-    except Exception as e:
-        return False, time.time() - start_time, str(e)
-
-def run_stress_test():
-    print(f"🔥 STARTING STRESS TEST: {NUM_REQUESTS} requests with {CONCURRENT_THREADS} threads...")
-    
-    success_count = 0
-    total_time = 0
-    latencies = []
-    
-    start_global = time.time()
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENT_THREADS) as executor:
-        futures = [executor.submit(fetch_question, i) for i in range(NUM_REQUESTS)]
-        
-        for future in concurrent.futures.as_completed(futures):
-            success, elapsed, result = future.result()
-            latencies.append(elapsed)
-            if success:
-                success_count += 1
+        if data is None:
+            return False
+        question = data.get("next_question")
+
+        for _ in range(self.args.answers):
+            if not question:
+                break
+            await self.think()
+            answer = self.pick_answer(question)
+            data = await self.call("POST", "/quiz/next", json={
+                "question_id": question["id"], "answer": answer,
+                "time_taken": random.randint(5, 60), "confidence": round(random.random(), 2)
+            })
+            if data is None:
+                return False
+            result = data.get("result") or {}
+            if result.get("correct") is not None:
+                self.known_keys[question["id"]] = result["correct"]
+            if result.get("is_correct") is False:
+                await self.call("POST", "/quiz/log_mistake", json={
+                    "question_id": question["id"],
+                    "topic": question.get("topic", "General"), "question_text": question.get("question", ""),
+                    "user_answer": answer, "correct_answer": result.get("correct") or ""
+                })
+            question = data.get("next_question")
+        return True
+
+    async def run_batched(self):
+        # Prefetch the whole sitting, answer locally, send answers in batches (mistakes are logged server-side)
+        data = await self.call("POST", "/quiz/session", json={"length": self.args.answers})
+        if data is None:
+            return False
+        questions = data.get("questions") or []
+        batch = []
+        for i, question in enumerate(questions):
+            await self.think()
+            batch.append({"question_id": question["id"], "answer": self.pick_answer(question),
+                          "time_taken": random.randint(5, 60), "confidence": round(random.random(), 2)})
+            if len(batch) >= self.args.batch_size or i == len(questions) - 1:
+                data = await self.call("POST", "/quiz/answers", json={"answers": batch})
+                if data is None:
+                    return False
+                for result in data.get("results") or []:
+                    if result and result.get("correct") is not None:
+                        self.known_keys[result["question_id"]] = result["correct"]
+                batch = []
+        return True
+
+async def run(args):
+    recorder = Recorder(args.bucket)
+    known_keys = {}
+    stats = {"offered": 0, "completed": 0, "failed": 0, "dropped": 0, "max_start_lag_ms": 0.0}
+    in_flight = set()
+
+    # One keep-alive pool shared by every session, like a fleet of app clients behind a NAT
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+
+        async def session(index):
+            try:
+                ok = await Session(client, recorder, args, index, known_keys).run()
+                stats["completed" if ok else "failed"] += 1
+            except Exception as e:
+                print(f"  session {index} crashed: {e!r}")
+                stats["failed"] += 1
+
+        started = time.monotonic()
+        next_arrival = started
+        index = 0
+        last_report = started
+        print(f"🔥 {args.rate} sessions/s for {args.duration}s against {args.base_url} "
+              f"({args.answers} answers each, {args.arrival} arrivals)")
+        while next_arrival - started < args.duration:
+            delay = next_arrival - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # How late the loop launched this session; large values mean the client is the bottleneck
+            stats["max_start_lag_ms"] = max(stats["max_start_lag_ms"], (time.monotonic() - next_arrival) * 1000)
+            stats["offered"] += 1
+            if len(in_flight) >= args.max_sessions:
+                stats["dropped"] += 1
             else:
-                print(f"❌ Failed: {result}")
-
-    total_duration = time.time() - start_global
-    avg_latency = sum(latencies) / len(latencies)
-    
-    print("\n" + "="*40)
-    print(f"📊 STRESS TEST RESULTS")
-    print("="*40)
-    print(f"✅ Successful Requests: {success_count}/{NUM_REQUESTS}")
-    print(f"⏱️  Total Duration:      {total_duration:.2f}s")
-    print(f"⚡ Avg Latency/Req:     {avg_latency*1000:.2f}ms")
-    print(f"🚀 Requests/Second:     {NUM_REQUESTS/total_duration:.2f}")
-    print("="*40)
+                task = asyncio.create_task(session(index))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            index += 1
+            gap = 1 / args.rate
+            next_arrival += random.expovariate(args.rate) if args.arrival == "poisson" else gap
+
+            now = time.monotonic()
+            if now - last_report >= args.report_every:
+                last_report = now
+                print(f"  {now - started:5.0f}s | {len(in_flight)} sessions in flight | "
+                      f"{stats['completed']} done | {stats['failed']} failed | {stats['dropped']} dropped")
+
+        if in_flight:
+            print(f"Arrivals done; waiting for {len(in_flight)} sessions...")
+            await asyncio.wait(list(in_flight), timeout=args.drain_timeout)
+        elapsed = time.monotonic() - started
+
+    endpoints, timeline = recorder.summary()
+    total = sum(e["count"] for e in endpoints.values())
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "password")},
+        "elapsed_s": elapsed,
+        "sessions": stats,
+        "requests": total,
+        "throughput_rps": total / max(elapsed, 1e-9),
+        "endpoints": endpoints,
+        "timeline": timeline
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(json.load(f), report)
+    return report
+
+def print_report(report):
+    print("\n" + "=" * 96)
+    print(f"📊 {report['requests']} requests in {report['elapsed_s']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s) | sessions: {report['sessions']}")
+    print("=" * 96)
+    print(f"{'endpoint':<30}{'count':>8}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    for endpoint, e in report["endpoints"].items():
+        print(f"{endpoint:<30}{e['count']:>8}{e['error_rate'] * 100:>6.1f}%"
+              f"{e['p50_ms']:>9.1f}{e['p95_ms']:>9.1f}{e['p99_ms']:>9.1f}{e['max_ms']:>9.1f}")
+    print("\nthroughput over time (req/s, errors):")
+    print("  " + " ".join(f"{b['rps']:.0f}/{b['errors']}" for b in report["timeline"]))
+
+def print_comparison(baseline, current):
+    print(f"\nvs baseline ({baseline['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s):")
+    for endpoint, e in current["endpoints"].items():
+        base = baseline["endpoints"].get(endpoint)
+        if base is None:
+            print(f"  {endpoint:<30} (new)")
+            continue
+        deltas = "  ".join(f"{p} {base[p + '_ms']:.1f}->{e[p + '_ms']:.1f}ms ({(e[p + '_ms'] / max(base[p + '_ms'], 1e-9) - 1) * 100:+.0f}%)"
+                           for p in ("p50", "p95", "p99"))
+        print(f"  {endpoint:<30} {deltas}  err {base['error_rate'] * 100:.1f}%->{e['error_rate'] * 100:.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test with scripted learner sessions")
+    parser.add_argument("--base_url", default="http://localhost:8000")
+    parser.add_argument("--rate", type=float, default=2.0, help="New sessions per second (offered load)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of arrivals")
+    parser.add_argument("--arrival", choices=["poisson", "constant"], default="poisson")
+    parser.add_argument("--answers", type=int, default=10, help="Answers per session")
+    parser.add_argument("--api", choices=["next", "batched"], default="next",
+                        help="next: one /quiz/next per answer; batched: /quiz/session prefetch + /quiz/answers")
+    parser.add_argument("--batch_size", type=int, default=5, help="Answers per /quiz/answers call (batched)")
+    parser.add_argument("--correct_ratio", type=float, default=0.6,
+                        help="Share of answers that are right once the key is known")
+    parser.add_argument("--think", type=float, default=0.5, help="Mean think time between answers (seconds)")
+    parser.add_argument("--max_sessions", type=int, default=1000,
+                        help="Sessions in flight before new arrivals are dropped (counted, not queued)")
+    parser.add_argument("--max_connections", type=int, default=200, help="Keep-alive pool size")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout (seconds)")
+    parser.add_argument("--drain_timeout", type=float, default=120.0, help="Max wait for sessions after arrivals stop")
+    parser.add_argument("--bucket", type=float, default=1.0, help="Timeline bucket (seconds)")
+    parser.add_argument("--report_every", type=float, default=5.0)
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--run_id", default=str(int(time.time())), help="Makes signup emails unique per run")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON report to diff against")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="Print failed requests")
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("Interrupted.")
 
 if __name__ == "__main__":
-    run_stress_test()
+    main()
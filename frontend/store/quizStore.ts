@@ -7,12 +7,35 @@ type Question = {
     difficulty: number;
     question: string;
     options: string[];
+};
+
+// Server-side grade for the answer just submitted (null for questions outside the bank)
+type AnswerResult = {
+    question_id: string;
+    is_correct: boolean;
     correct: string;
     misconception?: string;
 };
 
+// One answer waiting to be sent to /quiz/answers
+type PendingAnswer = {
+    question_id: string;
+    answer: string;
+    time_taken: number;
+    confidence: number;
+};
+
+type AnswersResponse = {
+    results: (AnswerResult | null)[];
+    questions: Question[];
+    mastery: Record<string, number>;
+    confidence_avg: number;
+};
+
 type QuizState = {
     currentQuestion: Question | null;
+    queue: Question[];
+    pendingAnswers: PendingAnswer[];
     history: any[];
     learnerState: any;
     mistakes: any[];
@@ -25,10 +48,76 @@ type QuizState = {
     // Actions
     setQuestion: (q: Question) => void;
     submitAnswer: (answer: string, confidence: number, timeTaken: number) => Promise<void>;
-    nextQuestion: () => void;
+    nextQuestion: () => Promise<void>;
     toggleMode: () => void;
 };
 
+// Quiz routes identify the learner from the bearer token, never from the body
+const authHeaders = () => {
+    const token = useAuthStore.getState().token;
+    return {
+        'Content-Type': 'application/json',
+        ...(token ? { 'Authorization': `Bearer ${token}` } : {})
+    };
+};
+
+const API_URL = 'http://localhost:8000/quiz';
+// Questions are prefetched in planned batches (/quiz/session) instead of one /quiz/next per answer
+const SESSION_LENGTH = 10;
+// Ask for the next batch along with an answer once the queue is this short
+const REFILL_AT = 3;
+// Exam mode shows no feedback, so answers are sent in batches of this size
+const EXAM_BATCH_SIZE = 5;
+
+const fetchSession = async (length: number): Promise<{ questions: Question[]; mastery: Record<string, number>; confidence_avg: number }> => {
+    const res = await fetch(`${API_URL}/session`, {
+        method: 'POST',
+        headers: authHeaders(),
+        body: JSON.stringify({ length })
+    });
+    if (!res.ok) throw new Error(`Session request failed: ${res.status}`);
+    return res.json();
+};
+
+// One round trip for many answers; wrong ones are logged to the mistake notebook server-side
+const postAnswers = async (answers: PendingAnswer[], prefetch: number): Promise<AnswersResponse> => {
+    const res = await fetch(`${API_URL}/answers`, {
+        method: 'POST',
+        headers: authHeaders(),
+        body: JSON.stringify({ answers, prefetch })
+    });
+    if (!res.ok) throw new Error(`Answer batch failed: ${res.status}`);
+    return res.json();
+};
+
+// RAG explanation for an answer the server has graded, as Server-Sent Events:
+// one `data: {"token": ...}` frame per token, then `data: [DONE]`
+const streamExplanation = async (body: { question_id: string; answer: string }, onToken: (token: string) => void): Promise<void> => {
+    const res = await fetch(`${API_URL}/explain/stream`, {
+        method: 'POST',
+        headers: authHeaders(),
+        body: JSON.stringify(body)
+    });
+    if (!res.ok || !res.body) throw new Error(`Explanation request failed: ${res.status}`);
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) return;
+        buffered += decoder.decode(value, { stream: true });
+        const frames = buffered.split('\n\n');
+        buffered = frames.pop() ?? '';
+        for (const frame of frames) {
+            const data = frame.split('\n').find((line) => line.startsWith('data: '))?.slice(6);
+            if (data === undefined) continue;
+            if (frame.startsWith('event: error')) throw new Error(`Explanation stream error: ${data}`);
+            if (data === '[DONE]') return;
+            onToken(JSON.parse(data).token);
+        }
+    }
+};
+
 // Mock initial question for demo if API fails
 const INITIAL_QUESTION: Question = {
     id: "INIT_001",
@@ -36,154 +125,186 @@ const INITIAL_QUESTION: Question = {
     difficulty: 1,
     question: "Ready to start your adaptive learning session?",
     options: ["Yes, let's go!", "Wait a moment"],
-    correct: "Yes, let's go!",
 };
 
-export const useQuizStore = create<QuizState>((set, get) => ({
-    currentQuestion: INITIAL_QUESTION,
-    history: [],
-    mistakes: [],
-    learnerState: {
-        topics: { "General": 0.5 },
-        confidence: 0.8
-    },
-    loading: false,
-    score: 0,
-    explanation: null,
-    mnemonicUrl: null,
-    quizMode: 'practice',
-
-    setQuestion: (q: Question) => set({ currentQuestion: q, explanation: null, mnemonicUrl: null }),
-
-    toggleMode: () => set((state) => ({ quizMode: state.quizMode === 'practice' ? 'exam' : 'practice' })),
-
-    submitAnswer: async (answer: string, confidence: number, timeTaken: number) => {
-        set({ loading: true });
-
-        const currentQ = get().currentQuestion;
-        const isCorrect = currentQ && answer === currentQ.correct;
-        const user = useAuthStore.getState().user;
-        const userId = user ? user.id : 0;
-
-        // Neuro-Flow Adaptation Logic
+export const useQuizStore = create<QuizState>((set, get) => {
+
+    const refillSize = () => (get().queue.length <= REFILL_AT ? SESSION_LENGTH : 0);
+
+    const mergeMastery = (data: { mastery?: Record<string, number>; confidence_avg?: number }) => {
         const state = get();
-        let newConfidence = state.learnerState.confidence;
-
-        // Update mistakes if wrong
-        let newMistakes = state.mistakes;
-        if (!isCorrect && currentQ) {
-            const mistakeData = {
-                // Correction: AuthStore has user.id as number.
-                user_id: user ? user.id : 1,
-                question_id: currentQ.id,
-                topic: currentQ.topic,
-                question_text: currentQ.question,
-                user_answer: answer,
-                correct_answer: currentQ.correct
-            };
+        return {
+            confidence: data.confidence_avg ?? state.learnerState.confidence,
+            topics: { ...state.learnerState.topics, ...(data.mastery || {}) }
+        };
+    };
 
-            // Optimistic Update
-            newMistakes = [...state.mistakes, { ...mistakeData, date: new Date().toISOString() }];
+    const mistakeEntry = (q: Question, answer: string, result: AnswerResult) => ({
+        question_id: q.id,
+        topic: q.topic,
+        question_text: q.question,
+        user_answer: answer,
+        correct_answer: result.correct,
+        date: new Date().toISOString()
+    });
 
-            // Send to Backend (Fire and Forget)
-            fetch('http://localhost:8000/quiz/log_mistake', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(mistakeData)
-            }).catch(err => console.error("Failed to log mistake:", err));
+    // Exam mode: send the buffered answers, then settle score, history and mistakes from the grades
+    const flushPending = async () => {
+        const sent = get().pendingAnswers;
+        if (sent.length === 0) return;
+        set({ pendingAnswers: [] });
+        try {
+            const data = await postAnswers(sent, refillSize());
+            set((state: QuizState) => {
+                const graded = new Map(sent.map((a, i) => [a.question_id, data.results[i]] as [string, AnswerResult | null]));
+                let gained = 0;
+                const newMistakes = [...state.mistakes];
+                const history = state.history.map((h) => {
+                    const result = h.isCorrect === null ? graded.get(h.question.id) : undefined;
+                    if (!result) return h;
+                    if (result.is_correct) gained += 10;
+                    else newMistakes.push(mistakeEntry(h.question, h.answer, result));
+                    return { ...h, isCorrect: result.is_correct };
+                });
+                return {
+                    history,
+                    score: state.score + gained,
+                    mistakes: newMistakes,
+                    queue: [...state.queue, ...data.questions],
+                    learnerState: mergeMastery(data)
+                };
+            });
+        } catch (e) {
+            console.error("Failed to submit answers, will retry with the next batch", e);
+            set((state: QuizState) => ({ pendingAnswers: [...sent, ...state.pendingAnswers] }));
         }
+    };
 
-        if (isCorrect) {
-            // Logic for Correct Answer (unchanged)
-            if (timeTaken < 5) newConfidence = Math.min(1.0, newConfidence + 0.1);
-            else if (timeTaken < 15) newConfidence = Math.min(1.0, newConfidence + 0.05);
-        } else {
-            // Logic for Wrong Answer
-            if (timeTaken < 3) newConfidence = Math.max(0.1, newConfidence - 0.15);
-            if (timeTaken < 3) newConfidence = Math.max(0.1, newConfidence - 0.15);
-            else newConfidence = Math.max(0.1, newConfidence - 0.1);
-        }
+    return {
+        currentQuestion: INITIAL_QUESTION,
+        queue: [],
+        pendingAnswers: [],
+        history: [],
+        mistakes: [],
+        learnerState: {
+            topics: { "General": 0.5 },
+            confidence: 0.8
+        },
+        loading: false,
+        score: 0,
+        explanation: null,
+        mnemonicUrl: null,
+        quizMode: 'practice',
 
-        const currentTopic = currentQ ? currentQ.topic : "General";
-        const newTopics = {
-            ...state.learnerState.topics,
-            [currentTopic]: isCorrect ? Math.min(1, (state.learnerState.topics[currentTopic] || 0.5) + 0.1) : Math.max(0, (state.learnerState.topics[currentTopic] || 0.5) - 0.1)
-        };
+        setQuestion: (q: Question) => set({ currentQuestion: q, explanation: null, mnemonicUrl: null }),
 
-        // Fetch valid next question or explanation from Backend API
-        try {
-            const res = await fetch('http://localhost:8000/quiz/next', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    user_id: userId,
-                    question_id: currentQ ? currentQ.id : "INIT",
-                    answer: answer,
-                    is_correct: isCorrect,
-                    time_taken: timeTaken,
-                    confidence: confidence
-                })
-            });
-            const data = await res.json();
-            const nextQ = data.next_question;
-            const backendState = data.learner_state;
-            const backendExplanation = data.explanation;
-
-            // Neuro-Flow: If wrong and explanation exists, show it FIRST (don't advance question yet)
-            const isExam = get().quizMode === 'exam';
-            if (!isCorrect && !isExam && (backendExplanation || currentQ?.misconception)) {
-                const fallbackExplanation = `It seems you have a misconception about ${currentQ?.topic}. ${currentQ?.misconception || ''}.`;
-
-                set({
-                    explanation: backendExplanation || fallbackExplanation,
-                    loading: false,
-                    mnemonicUrl: "https://images.unsplash.com/photo-1559757175-5700dde675bc?w=800",
-                    learnerState: {
-                        confidence: backendState ? backendState.confidence_avg : newConfidence,
-                        topics: backendState ? backendState.topic_mastery : newTopics
-                    },
-                    mistakes: newMistakes
-                });
-                // Note: We do NOT update currentQuestion here. The user must click "Got it" in ExplanationBox to call nextQuestion().
+        toggleMode: () => {
+            // Answers buffered in exam mode are graded before the mode changes
+            flushPending();
+            set((state) => ({ quizMode: state.quizMode === 'practice' ? 'exam' : 'practice' }));
+        },
+
+        submitAnswer: async (answer: string, confidence: number, timeTaken: number) => {
+            const currentQ = get().currentQuestion;
+
+            // The welcome card isn't graded: it just starts the session
+            if (!currentQ || currentQ.id === INITIAL_QUESTION.id) {
+                set({ loading: true });
+                await get().nextQuestion();
+                set({ loading: false });
+                return;
+            }
+
+            const entry: PendingAnswer = {
+                question_id: currentQ.id,
+                answer: answer,
+                time_taken: timeTaken,
+                confidence: confidence
+            };
+
+            // Exam: no feedback, so move on at once and grade in batches
+            if (get().quizMode === 'exam') {
+                set((state: QuizState) => ({
+                    pendingAnswers: [...state.pendingAnswers, entry],
+                    history: [...state.history, { question: currentQ, answer, isCorrect: null }]
+                }));
+                const batchFull = get().pendingAnswers.length >= EXAM_BATCH_SIZE;
+                const lastQueued = get().queue.length === 0;
+                if (batchFull || lastQueued) await flushPending();
+                await get().nextQuestion();
                 return;
             }
 
-            set((state: QuizState) => ({
-                loading: false,
-                currentQuestion: nextQ,
-                score: state.score + (isCorrect ? 10 : 0),
-                explanation: null,
-                mnemonicUrl: null,
-                history: [...state.history, { question: currentQ, answer, isCorrect }],
-                mistakes: newMistakes,
-                learnerState: {
-                    confidence: backendState ? backendState.confidence_avg : newConfidence,
-                    topics: backendState ? backendState.topic_mastery : newTopics
+            set({ loading: true });
+
+            // Practice: the grade is needed before moving on, but the next question is already queued
+            try {
+                const data = await postAnswers([entry], refillSize());
+                const result: AnswerResult | null = data.results[0];
+                const isCorrect = result ? result.is_correct : false;
+                const state = get();
+
+                // Wrong answers were logged server-side; mirror them locally for the notebook
+                let newMistakes = state.mistakes;
+                if (result && !isCorrect) {
+                    newMistakes = [...state.mistakes, mistakeEntry(currentQ, answer, result)];
                 }
-            }));
 
-        } catch (e) {
-            console.error("Failed to load questions from backend", e);
-            set({ loading: false });
-        }
-    },
+                const learnerState = mergeMastery(data);
+                const queue = [...state.queue, ...data.questions];
 
-    nextQuestion: async () => {
-        try {
-            const user = useAuthStore.getState().user;
-            const userId = user ? user.id : 0;
-
-            // Simple request for next question without state update context
-            const res = await fetch('http://localhost:8000/quiz/next', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ user_id: userId, question_id: "SKIP", answer: "SKIP", time_taken: 0, confidence: 0 })
-            });
-            const data = await res.json();
-            set({ explanation: null, currentQuestion: data.next_question });
-        } catch (e) {
-            set({ explanation: null });
-        }
-    }
+                // Neuro-Flow: if wrong, show the explanation FIRST (don't advance question yet).
+                // The stored misconception shows at once and is replaced as the RAG explanation streams in.
+                if (result && !isCorrect) {
+                    set({
+                        explanation: result.misconception
+                            ? `It seems you have a misconception about ${currentQ.topic}. ${result.misconception}.`
+                            : `The correct answer is ${result.correct}.`,
+                        loading: false,
+                        mnemonicUrl: "https://images.unsplash.com/photo-1559757175-5700dde675bc?w=800",
+                        learnerState,
+                        queue,
+                        history: [...state.history, { question: currentQ, answer, isCorrect }],
+                        mistakes: newMistakes
+                    });
+                    let streamed = '';
+                    streamExplanation({ question_id: currentQ.id, answer }, (token) => {
+                        streamed += token;
+                        // Stop updating once the learner has moved on
+                        if (get().currentQuestion?.id === currentQ.id) set({ explanation: streamed });
+                    }).catch(err => console.error("Explanation stream failed, keeping the stored misconception:", err));
+                    // Note: We do NOT update currentQuestion here. The user must click "Got it" in ExplanationBox to call nextQuestion().
+                    return;
+                }
 
-}));
+                set((state: QuizState) => ({
+                    loading: false,
+                    queue,
+                    score: state.score + (isCorrect ? 10 : 0),
+                    history: [...state.history, { question: currentQ, answer, isCorrect }],
+                    mistakes: newMistakes,
+                    learnerState
+                }));
+                await get().nextQuestion();
+
+            } catch (e) {
+                console.error("Failed to submit answer to backend", e);
+                set({ loading: false });
+            }
+        },
+
+        nextQuestion: async () => {
+            try {
+                // Served from the prefetched queue; only an empty queue costs a round trip
+                if (get().queue.length === 0) {
+                    const data = await fetchSession(SESSION_LENGTH);
+                    set({ queue: data.questions, learnerState: mergeMastery(data) });
+                }
+                const [next, ...rest] = get().queue;
+                set({ explanation: null, mnemonicUrl: null, currentQuestion: next ?? null, queue: rest });
+            } catch (e) {
+                set({ explanation: null });
+            }
+        }
+    };
+});